@@ -0,0 +1,458 @@
+# tests for the parts of word_puzzles.py that have to be right, not just fast
+# run with: python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import word_puzzles as wp
+
+
+FIXTURES = os.path.join(wp.dname, 'fixtures')
+
+
+
+def read_fixture(mode, word):
+    with open(os.path.join(FIXTURES, mode, word + '.html'), encoding='utf-8') as infile:
+        return infile.read()
+
+
+BASE_WORDS = ['bird', 'black', 'blackbird', 'dog', 'house', 'songbird']
+
+
+# importing the script moves into its own folder, so every test that touches the data files works in a fresh
+# temporary folder of its own instead, starting from a small one_grams.csv
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wp.write_one_grams(BASE_WORDS)
+    return tmp_path
+
+
+
+#### parse_suggestions ####
+
+def test_parse_suggestions_reads_a_saved_page():
+    suggestions = list(wp.parse_suggestions([read_fixture('s', 'bird')]))
+
+    assert suggestions[0] == ['bird']
+    assert ['birdbath'] in suggestions
+    assert ['bird', 'dog'] in suggestions
+
+    # three words, or a hyphen, and the suggestion can never be used
+    assert ['bird', 'of', 'paradise'] not in suggestions
+    assert ['bird-watch'] not in suggestions
+    assert all(word == word.lower() for words in suggestions for word in words)
+
+
+def test_parse_suggestions_gives_the_same_answer_however_the_page_is_split():
+    text = read_fixture('e', 'house')
+    whole = list(wp.parse_suggestions([text]))
+
+    for size in (1, 7, 100, 8192):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(wp.parse_suggestions(chunks)) == whole
+
+
+def test_parse_suggestions_raises_for_a_page_without_suggestions():
+    with pytest.raises(IndexError):
+        list(wp.parse_suggestions(['<html><body><ul class=other><li><a href="x">bird</a></li></ul></body></html>']))
+
+
+def test_parse_suggestions_stops_at_the_first_other_list():
+    page = ('<ul class=suggestions><li><a href="a">one</a></li></ul>\n'
+            '<a href="b">Two Words</a>\n'
+            '<ul class=suggestions><li><a href="c">three</a></li></ul>\n'
+            '<a href="d">four</a>\n'
+            '<ul class=related><li><a href="e">five</a></li></ul>\n')
+
+    # links between two lists of suggestions count, but not the ones after the last list
+    assert list(wp.parse_suggestions([page])) == [['one'], ['two', 'words'], ['three']]
+
+
+def test_parse_suggestions_agrees_with_the_original_extraction():
+    for mode in ('s', 'e'):
+        for filename in sorted(os.listdir(os.path.join(FIXTURES, mode))):
+            text = read_fixture(mode, filename[:-len('.html')])
+            original = [result.split(' ') for result in wp.extract_suggestions(text)
+                        if '-' not in result and '(' not in result and ',' not in result
+                        and len(result.split(' ')) <= 2]
+
+            assert list(wp.parse_suggestions([text])) == original
+
+
+
+#### the journal ####
+
+def test_saved_changes_are_replayed_from_the_journal(data_dir):
+    lexicon = wp.open_lexicon()
+    assert lexicon.add('robin')
+    assert lexicon.discard('dog')
+    wp.save_lexicon(lexicon, None, ['robin'])
+
+    # the changes are only in the journal; one_grams.csv isn't rewritten until the journal is compacted
+    assert wp.read_journal() == (wp.lexicon_build_id(), [('+', 'robin'), ('-', 'dog')])
+    assert wp.read_one_grams() == BASE_WORDS
+
+    reopened = wp.open_lexicon()
+    assert 'robin' in reopened
+    assert 'dog' not in reopened
+    assert sorted(reopened) == sorted(set(BASE_WORDS) - {'dog'} | {'robin'})
+
+
+def test_a_run_that_changes_nothing_writes_nothing(data_dir):
+    wp.save_lexicon(wp.open_lexicon(), None, [])
+
+    assert not os.path.exists(wp.JOURNAL_PATH)
+
+
+def test_a_half_written_line_is_ignored_and_then_finished_off(data_dir):
+    lexicon = wp.open_lexicon()
+    lexicon.add('robin')
+    wp.save_lexicon(lexicon, None, [])
+
+    # a run that stopped in the middle of writing a change
+    with open(wp.JOURNAL_PATH, 'a') as outfile:
+        outfile.write('+wr')
+    assert 'wr' not in wp.open_lexicon()
+
+    lexicon = wp.open_lexicon()
+    lexicon.add('wren')
+    wp.save_lexicon(lexicon, None, [])
+
+    reopened = wp.open_lexicon()
+    assert 'robin' in reopened and 'wren' in reopened
+    assert 'wrwren' not in reopened
+
+
+def test_compaction_folds_the_journal_into_the_word_list(data_dir):
+    wp.build_compound_index(BASE_WORDS)
+
+    lexicon = wp.open_lexicon()
+    compound_index = wp.open_compound_index(lexicon)
+    lexicon.add('song')
+    lexicon.discard('dog')
+    wp.update_compound_index(compound_index, ['song'], lexicon)
+    wp.save_lexicon(lexicon, compound_index, ['song'])
+    old_build_id = wp.lexicon_build_id()
+
+    wp.compact_lexicon()
+
+    assert not os.path.exists(wp.JOURNAL_PATH)
+    assert sorted(wp.read_one_grams()) == sorted(set(BASE_WORDS) - {'dog'} | {'song'})
+    assert wp.lexicon_build_id() != old_build_id
+    assert wp.load_compound_index()['starting']['song'] == ['songbird']
+
+    reopened = wp.open_lexicon()
+    assert 'song' in reopened.base and 'dog' not in reopened
+    assert reopened.journal_length == 0
+
+
+def test_compaction_happens_once_the_journal_is_long_enough(data_dir, monkeypatch):
+    monkeypatch.setattr(wp, 'JOURNAL_COMPACT_AT', 3)
+
+    lexicon = wp.open_lexicon()
+    lexicon.add('robin')
+    wp.save_lexicon(lexicon, None, [])
+    assert os.path.exists(wp.JOURNAL_PATH)
+
+    lexicon.add('wren')
+    lexicon.add('finch')
+    wp.save_lexicon(lexicon, None, [])
+
+    assert not os.path.exists(wp.JOURNAL_PATH)
+    assert {'robin', 'wren', 'finch'} <= set(wp.read_one_grams())
+
+
+def test_compaction_leaves_the_indexes_to_be_rebuilt_when_theyre_opened(data_dir):
+    wp.open_pattern_index(wp.open_lexicon())
+
+    lexicon = wp.open_lexicon()
+    lexicon.add('robin')
+    wp.save_lexicon(lexicon, None, [])
+    wp.compact_lexicon()
+
+    # the old index no longer matches the lexicon, but opening it brings it up to date
+    reopened = wp.open_lexicon()
+    assert not wp.PatternIndex(reopened.base, 'one_grams.pat').matches_lexicon()
+    assert wp.find_pattern_matches('rob??', reopened, wp.open_pattern_index(reopened)) == ['robin']
+
+    # by hand, the indexes are rebuilt straight away
+    reopened.add('robins')
+    wp.save_lexicon(reopened, None, [])
+    wp.compact_lexicon(rebuild_indexes=True)
+    assert wp.PatternIndex(wp.open_lexicon().base, 'one_grams.pat').matches_lexicon()
+
+
+
+#### compounds in the journal ####
+
+def test_compounds_made_with_new_words_are_saved_in_the_journal(data_dir):
+    wp.build_compound_index(BASE_WORDS)
+
+    lexicon = wp.open_lexicon()
+    compound_index = wp.open_compound_index(lexicon)
+    lexicon.add('song')
+    wp.update_compound_index(compound_index, ['song'], lexicon)
+    wp.save_lexicon(lexicon, compound_index, ['song'])
+
+    # compound_index.json itself is left alone, and the new compound comes back from the journal
+    assert 'song' not in wp.load_compound_index()['starting']
+    reopened = wp.open_lexicon()
+    assert wp.open_compound_index(reopened)['starting']['song'] == ['songbird']
+    assert 'songbird' in wp.open_compound_index(reopened)['ending']['bird']
+
+
+
+#### writing files ####
+
+def test_a_file_that_fails_partway_through_is_left_as_it_was(tmp_path):
+    path = str(tmp_path / 'words.txt')
+    with wp.write_atomically(path, 'w') as outfile:
+        outfile.write('old')
+
+    with pytest.raises(RuntimeError):
+        with wp.write_atomically(path, 'w') as outfile:
+            outfile.write('new')
+            raise RuntimeError('stopped')
+
+    assert open(path).read() == 'old'
+    assert os.listdir(str(tmp_path)) == ['words.txt']
+
+
+def test_every_index_checks_its_magic(data_dir):
+    base = wp.open_lexicon().base
+    for index_type in (wp.FrequencyStore, wp.SuffixArray, wp.SpellingIndex, wp.PatternIndex, wp.AnagramIndex):
+        with pytest.raises(ValueError):
+            index_type(base, 'one_grams.lex')
+
+
+
+#### the frequency store ####
+
+def test_compaction_keeps_the_frequencies(data_dir):
+    lexicon = wp.open_lexicon()
+    wp.build_frequency_store({'bird': 500, 'dog': 900})
+
+    lexicon.add('aardvark')
+    wp.save_lexicon(lexicon, None, [])
+    wp.compact_lexicon()
+
+    # every word ID after 'aardvark' moved, but the counts still belong to the same words
+    frequencies = wp.open_frequencies(wp.open_lexicon())
+    assert frequencies.matches_lexicon()
+    assert frequencies.get('bird') == 500
+    assert frequencies.get('dog') == 900
+    assert frequencies.get('aardvark') == 0
+
+
+
+#### the curation lists ####
+
+def test_curation_adds_and_leaves_out_words(data_dir):
+    lexicon = wp.open_lexicon()
+    lexicon.curate(['zebra', 'bird'], ['dog'])
+
+    assert 'zebra' in lexicon
+    assert 'dog' not in lexicon
+    assert sorted(lexicon) == sorted(set(BASE_WORDS) - {'dog'} | {'zebra'})
+    assert len(lexicon) == len(BASE_WORDS)
+
+    # a word that's already in the lexicon isn't curated on top of it
+    assert lexicon.curated == ['zebra']
+
+    assert lexicon.words_with_prefix('b') == ['bird', 'black', 'blackbird']
+    assert lexicon.words_with_suffix('ra') == ['zebra']
+
+
+def test_blacklisted_words_are_never_added(data_dir):
+    lexicon = wp.open_lexicon()
+    lexicon.curate([], ['dog', 'robin'])
+
+    assert not lexicon.add('robin')
+    assert not lexicon.add('dog')
+    assert lexicon.changes == []
+
+
+def test_curation_is_never_saved(data_dir):
+    lexicon = wp.open_lexicon()
+    lexicon.curate(['zebra'], ['dog'])
+    lexicon.add('robin')
+    wp.save_lexicon(lexicon, None, [])
+    wp.compact_lexicon()
+
+    # the lists are applied on top every time the lexicon is opened, so taking a word off them takes effect
+    saved = set(wp.read_one_grams())
+    assert 'robin' in saved
+    assert 'dog' in saved
+    assert 'zebra' not in saved
+
+
+def test_load_data_applies_the_curation_lists(data_dir):
+    with open(wp.ADD_WORDS_PATH, 'w') as outfile:
+        outfile.write('# words to add\nZebra\n\n')
+    with open(wp.BLACKLIST_PATH, 'w') as outfile:
+        outfile.write('dog\n')
+
+    lexicon, frequencies, compound_index = wp.load_data()
+
+    assert 'zebra' in lexicon
+    assert 'dog' not in lexicon
+
+    # a fresh copy has no compound index yet, so it's built from the saved word list the first time
+    assert os.path.exists('compound_index.json')
+    assert compound_index['ending']['bird'] == ['blackbird']
+
+
+def test_the_default_lists_are_used_when_the_files_are_missing(data_dir):
+    lexicon = wp.load_data()[0]
+
+    assert set(wp.DEFAULT_ADD_WORDS) <= set(lexicon)
+    assert lexicon.curated == wp.DEFAULT_ADD_WORDS
+    assert wp.read_word_list(wp.ADD_WORDS_PATH, wp.DEFAULT_ADD_WORDS) == ['gam']
+
+    # but an empty file is an empty list
+    open(wp.ADD_WORDS_PATH, 'w').close()
+    assert wp.read_word_list(wp.ADD_WORDS_PATH, wp.DEFAULT_ADD_WORDS) == []
+
+
+def test_the_default_lists_match_the_files():
+    assert wp.read_word_list(os.path.join(wp.dname, wp.ADD_WORDS_PATH)) == wp.DEFAULT_ADD_WORDS
+    assert wp.read_word_list(os.path.join(wp.dname, wp.BLACKLIST_PATH)) == wp.DEFAULT_BLACKLIST
+
+
+
+#### network errors ####
+
+# a stand-in for the free dictionary that answers with the saved pages, except for the words in missing, which
+# get a 404 the way a page that can't be reached would
+@pytest.fixture
+def dictionary(monkeypatch):
+    import http.server
+    import threading
+
+    missing = set()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            mode, word = self.path.strip('/').split('/')
+            if word in missing:
+                self.send_error(404)
+                return
+            body = read_fixture(mode, word).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('localhost', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(wp, 'DICTIONARY_URL', 'http://localhost:%d' % server.server_port)
+
+    yield missing
+    server.shutdown()
+    server.server_close()
+
+
+def test_a_word_that_cant_be_downloaded_doesnt_stop_a_batch(data_dir, dictionary, monkeypatch):
+    import io
+    import json
+
+    monkeypatch.setattr(wp, 'batch_data', None)
+    dictionary.add('house')
+    with open('words.txt', 'w') as outfile:
+        outfile.write('house\nbird\n')
+
+    output = io.StringIO()
+    wp.run_batch('words.txt', output, processes=1, requests_per_second=1000)
+    records = {record['word']: record for record in map(json.loads, output.getvalue().splitlines())}
+
+    assert '404' in records['house']['error']
+    assert records['bird']['valid']
+    assert 'blackbird' in [result['word'] for result in records['bird']['ending']]
+
+    # nothing is cached for the word that failed, so it's tried again next time
+    cache = wp.SuggestionCache()
+    assert cache.get('s', 'house') == (False, None)
+    assert cache.get('s', 'bird')[0]
+    cache.close()
+
+
+def test_the_server_answers_with_a_502_when_the_dictionary_cant_be_reached(data_dir, dictionary):
+    import http.client
+    import json
+    import threading
+
+    dictionary.add('house')
+    server = wp.make_query_server(port=0, workers=2, live=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        connection = http.client.HTTPConnection('localhost', server.server_port, timeout=10)
+        connection.request('GET', '/search?word=house')
+        response = connection.getresponse()
+        assert response.status == 502
+        assert '404' in json.loads(response.read())['error']
+
+        # and the connection is still good for the next search
+        connection.request('GET', '/search?word=bird')
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())['valid']
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_idle_connections_dont_hold_up_other_clients(data_dir, dictionary):
+    import http.client
+    import socket
+    import threading
+
+    server = wp.make_query_server(port=0, workers=2, live=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    # two clients that search once and then keep their connections open without sending anything else
+    idle = []
+    for i in range(2):
+        connection = http.client.HTTPConnection('localhost', server.server_port, timeout=10)
+        connection.request('GET', '/search?word=bird')
+        connection.getresponse().read()
+        idle.append(connection)
+
+    try:
+        connection = http.client.HTTPConnection('localhost', server.server_port, timeout=2)
+        connection.request('GET', '/stats')
+        assert connection.getresponse().status == 200
+        connection.close()
+    except socket.timeout:
+        pytest.fail('a third client was kept waiting by the idle connections')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    thread.join(5)
+    assert not thread.is_alive()
+    for connection in idle:
+        connection.close()
+
+
+
+#### the two-gram harvest ####
+
+def test_the_harvest_leaves_out_blacklisted_words(data_dir, dictionary):
+    with open(wp.BLACKLIST_PATH, 'w') as outfile:
+        outfile.write('birdbath\n')
+
+    wp.harvest_two_grams(['bird'], requests_per_second=1000)
+
+    saved = [word for change, word in wp.read_journal()[1] if change == '+']
+    assert 'birdcage' in saved
+    assert 'birdbath' not in saved
@@ -25,17 +25,27 @@
 
 
 # import necessary packages
-import pandas as pd
-import requests
+# pandas and requests take a while to import, so they're only imported inside the functions that need them;
+# a search for a word we've looked up recently never needs either one
 import datetime
 import re
 import os
+import sys
 import json
+import csv
+import mmap
+import time
+import zlib
+import itertools
+import heapq
+import fnmatch
+import sqlite3
+import threading
+from array import array
 from collections import Counter
-
-
-# clear the contents of the terminal at the start of each run, to help keep things easy to read
-os.system('clear') 
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from urllib.parse import urlparse
 
 
 # set the working directory to be wherever this file is stored
@@ -47,578 +57,4060 @@ os.chdir(dname)
 
 
 
-# creates the file one_grams.csv from a number of word lists found online
+# Profiling: with --profile, the time spent in each stage of a search (loading the data, fetching the pages,
+# matching, ranking, printing, saving) is added up under a name, along with counters like the number of candidate
+# words looked at and the number of bytes downloaded, and the totals are saved as a JSON report at the end.
+# The stages are marked in the code with "with span('name'):" and the counters with count_event('name', n); when
+# profiling is off, both do nothing, so they cost next to nothing.
+
+# {name: [total seconds, number of times]} and {name: total} while profiling; None otherwise
+profile_spans = None
+profile_counters = None
+profile_started = None
+profile_lock = threading.Lock()
+
+
+
+# times everything inside a "with" block while profiling is on
+class Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exception):
+        elapsed = time.perf_counter() - self.started
+        with profile_lock:
+            totals = profile_spans.setdefault(self.name, [0.0, 0])
+            totals[0] += elapsed
+            totals[1] += 1
+
+
+
+# stands in for Span while profiling is off
+class NoSpan:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exception):
+        pass
+
+NO_SPAN = NoSpan()
+
+
+
+# marks a stage to be timed; use as "with span('name'):"
+def span(name):
+    if profile_spans is None:
+        return NO_SPAN
+    return Span(name)
+
+
+
+# adds n to a counter while profiling is on
+def count_event(name, n=1):
+    if profile_counters is not None:
+        with profile_lock:
+            profile_counters[name] = profile_counters.get(name, 0) + n
+
+
+
+# turns profiling on (and starts the clock for the report's total time)
+def start_profiling():
+    global profile_spans, profile_counters, profile_started
+    profile_spans = {}
+    profile_counters = {}
+    profile_started = time.perf_counter()
+
+
+
+# turns profiling off and returns the report; the stages can be inside one another (fetching happens while looking
+# up the two-grams, for example), so their times can add up to more than the total
+def stop_profiling():
+    global profile_spans, profile_counters
+    report = {'total_ms': (time.perf_counter() - profile_started) * 1000,
+              'spans': {name: {'ms': seconds * 1000, 'calls': calls}
+                        for name, (seconds, calls) in sorted(profile_spans.items(), key=lambda item: -item[1][0])},
+              'counters': dict(sorted(profile_counters.items()))}
+    profile_spans = None
+    profile_counters = None
+
+    return report
+
+
+
+# opens a file to be written under a temporary name ('one_grams.lex.tmp1234'), and swaps it in for path once the
+# "with" block is done, so the file is never left half-written, and any script that already has the old file open
+# keeps reading it safely; if anything goes wrong partway through, the old file is left as it was
+# use as "with write_atomically(path) as outfile:"; mode and options are passed on to open
+@contextmanager
+def write_atomically(path, mode='wb', **options):
+    temp_path = path + '.tmp%d' % os.getpid()
+    try:
+        with open(temp_path, mode, **options) as outfile:
+            yield outfile
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+
+
+# remove these words from the word lists as we find them
+fake_words = ['ing','bede','ery','lin','lar','ped']
+
+
+
+# reads one of the letter files of words and cleans it up, returning the words that pass our checks in the
+# order they appear; the checks are run on the whole column of words at once, rather than one word at a time
+def clean_word_list(letter):
+    import pandas as pd
+
+    # open the letter's corresponding file of words; any badly formatted lines are skipped, and every cell is read
+    # as text (otherwise words like "nan" and "null" would be read as missing values)
+    filename = 'word_lists/'+letter+'word.csv'
+    curr_df = pd.read_csv(filename, header=None, engine='python', on_bad_lines='skip', encoding="ISO-8859-1",
+                          dtype=str, keep_default_na=False)
+
+    # strip away any whitespace, newlines, etc., and set to lowercase
+    curr_words = curr_df[0].str.strip().str.lower()
+
+    # skip if meets any of the following criteria
+    skip = ((~curr_words.str.isalpha() & ~(curr_words.str.contains('-', regex=False) &
+                                             curr_words.str.contains('_', regex=False))) |
+            curr_words.str.contains('aa', regex=False) | curr_words.str.contains('abc', regex=False) |
+            curr_words.str.endswith('-') | curr_words.str.startswith('-') |
+            (curr_words.str.len() == 1) | curr_words.isin(fake_words))
+    curr_words = curr_words[~skip]
+
+    # for words with an underscore, only keep the part before it
+    curr_words = curr_words.str.split('_', n=1).str[0]
+
+    return curr_words.tolist()
+
+
+
+# creates the file one_grams.csv from a number of word lists found online, along with everything built from it:
+# one_grams.lex, compound_index.json and word_freqs.bin (keeping the frequencies we already have, word by word)
+# the 26 letter files are cleaned up at the same time, in separate processes
 # this function should only ever need to be run once, but leaving it here for reference
-def clean_and_build_file():
+def clean_and_build_file(processes=None):
     # print console update that process is starting
     e = datetime.datetime.now()
     print ("Beginning at %s:%s:%s" % (e.hour, e.minute, e.second))
-    
-    # empty list to hold all words
-    words = []
-    
+
+    # time each stage of the rebuild
+    timings = []
+    t0 = time.perf_counter()
+
     # all 26 letters; used to identify the individual word files
     letters = ['A','B','C','D','E','F','G','H','I','J','K','L','M',
                'N','O','P','Q','R','S','T','U','V','W','X','Y','Z']
-    
-    # remove these words as we find them
-    fake_words = ['ing','bede','ery','lin','lar','ped']
-    
-    # loop through every letter
-    for letter in letters:
-        # open the letter's corresponding file of words
-        filename = 'word_lists/'+letter+'word.csv'
-        curr_df = pd.read_csv(filename, header=None, engine='python', error_bad_lines=False, encoding="ISO-8859-1")
-        
-        # loop thorugh each word in the
-        for i in range(len(curr_df)):
-            curr_word = curr_df.iloc[i,0]
-            
-            # strip away any whitespace, newlines, etc.
-            curr_word = curr_word.strip()
-            
-            # set to lowercase if not already
-            if not curr_word.islower():
-                curr_word = curr_word.lower()
-        
-            # skip if meets any of the following criteria
-            if ((not curr_word.isalpha() and ('-' not in curr_word or '_' not in curr_word)) or 
-                "aa" in curr_word or "abc" in curr_word or curr_word[-1] == '-' or 
-                curr_word[0] == '-' or len(curr_word) == 1 or curr_word in fake_words):
-                pass
-            
-            else:
-                if '_' in curr_word:
-                    sp = curr_word.split('_')
-                    words.append(sp[0])
-                else:
-                    words.append(curr_word)
 
-    
-    # cast to a Counter; this will make each unique word a key
-    no_dups = dict(Counter(words))
-    
-    # get all unique words by grabbing the Counter keys
-    words = no_dups.keys()
-    
-    # print update that we're finished
+    # clean up every letter's file at once; the results come back in the order of the letters
+    with ProcessPoolExecutor(processes) as pool:
+        word_lists = list(pool.map(clean_word_list, letters))
+    timings.append(('clean word lists', time.perf_counter() - t0))
+
+    # get all unique words, keeping the first time each one appears
+    t0 = time.perf_counter()
+    words = list(dict.fromkeys(itertools.chain.from_iterable(word_lists)))
+    timings.append(('remove duplicates', time.perf_counter() - t0))
+
+    # save to csv, and then the binary lexicon (written after the csv, so it isn't rebuilt again when it's opened),
+    # holding the lock so no other copy of the script saves to the journal in the middle of it
+    with LexiconLock():
+        word_freqs = saved_frequencies()
+
+        t0 = time.perf_counter()
+        write_one_grams(words)
+        timings.append(('write one_grams.csv', time.perf_counter() - t0))
+
+        t0 = time.perf_counter()
+        build_binary_lexicon(words)
+        timings.append(('write one_grams.lex', time.perf_counter() - t0))
+
+        # this is a fresh data set, so any changes saved in the journal no longer apply
+        if os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+
+    t0 = time.perf_counter()
+    build_compound_index(words)
+    timings.append(('write compound_index.json', time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_suffix_array()
+    timings.append(('write one_grams.sfx', time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_spelling_index()
+    timings.append(('write one_grams.del', time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_pattern_index()
+    timings.append(('write one_grams.pat', time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_anagram_index()
+    timings.append(('write one_grams.ana', time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    build_frequency_store(word_freqs)
+    timings.append(('write word_freqs.bin', time.perf_counter() - t0))
+
+    # print update that we're finished, with how long each stage took
     e = datetime.datetime.now()
     print ("Finished at %s:%s:%s" % (e.hour, e.minute, e.second))
-    
-    # set to pandas dataframe so we can export
-    word_df = pd.DataFrame(words)
-    
-    # save to csv
-    word_df.to_csv('one_grams.csv', index=False)
-        
-    
-    
-# Similar to the function above, this function is really only needed the first time, or any time you wish to 
-# reset or overwrite the list of word frequencies; leaving this function here for reference
-def build_and_export_frequencies():
-    # read in the list of words and their frequencies
-    freq_df = pd.read_csv('ngram_freq.csv')
-    
-    # now limit to just reasonably popular words (> 1000 uses)
-    freq_df = freq_df[freq_df['count'] > 1000]
-    
-    # now create a dictionary in the format {word:frequency}
-    word_freqs = {}
-    
-    # begin by looping through each row of the dataframe
-    for r in range(len(freq_df)):
-        # add to dictionary using the word as the key and the count as the value
-        word_freqs[freq_df.iloc[r]['word']] = int(freq_df.iloc[r]['count'])
-        
-    # save the dictionary as a json file so we don't have to build the dictionary every time
-    with open("word_freqs.json", "w") as outfile: 
-        json.dump(word_freqs, outfile)
-    
-    
-    
-    
-    
-    
+    for stage, seconds in timings:
+        print('%-26s %7.2f s' % (stage, seconds))
+    print('%d words' % len(words))
 
-#### MAIN #################################################################################################################
-    
+    return timings
 
-#### Call above functions, if necessary ####
-    
-# only call this function to reset the data set of one grams! Otherwise, leave it commented out
-# clean_and_build_file()
 
-# only call this function to reset the data set of word frequencies; otherwise, leave it commented out
-# build_and_export_frequencies()
 
+# Builds the word frequencies out of the Ngram dump (ngram_freq.csv, with 'word' and 'count' columns), keeping
+# just reasonably popular words (more than threshold uses). The dump is read chunk_size rows at a time, so only
+# one chunk is ever in memory however big the file is. The frequencies are saved to word_freqs.json and written
+# straight into word_freqs.bin, the frequency store the script reads.
+# With lexicon_only, words that aren't in our lexicon are left out (which keeps both files small, but words added
+# to the lexicon later won't have a frequency until this is run again).
+# This function is really only needed the first time, or any time you wish to reset or overwrite the list of word
+# frequencies; leaving this function here for reference
+def build_and_export_frequencies(path='ngram_freq.csv', threshold=1000, lexicon_only=False, chunk_size=100000):
+    import resource
+    import numpy as np
+    import pandas as pd
 
+    t0 = time.perf_counter()
 
+    # the store has one count per word ID of the binary lexicon; words without a frequency get a zero
+    base = open_lexicon().base
+    word_ids = {word: word_id for word_id, word in enumerate(base)}
+    counts = np.zeros(len(base), dtype=np.uint64)
+    others = {}
 
+    # word_freqs.json is written as we go, in the format {word: frequency}, under a temporary name until it's done
+    rows = kept = 0
+    with write_atomically('word_freqs.json', 'w', encoding='utf-8') as outfile:
+        outfile.write('{')
 
+        # every word is read as text (otherwise words like "nan" and "null" would be read as missing values)
+        chunks = pd.read_csv(path, usecols=['word', 'count'], dtype={'word': str, 'count': np.int64},
+                             keep_default_na=False, chunksize=chunk_size)
+        for chunk in chunks:
+            rows += len(chunk)
 
-#### Read in and manipulate data files ####
+            # limit to just reasonably popular words, and to the words in our lexicon if asked to
+            chunk = chunk[chunk['count'] > threshold]
+            ids = chunk['word'].map(word_ids)
+            if lexicon_only:
+                chunk, ids = chunk[ids.notna()], ids[ids.notna()]
 
-# read in data set of one-grams
-data = pd.read_csv('one_grams.csv')
+            # fill in the counts of the words that are in the lexicon, and keep the rest for words added to it later
+            in_lexicon = ids.notna()
+            counts[ids[in_lexicon].astype(np.int64).to_numpy()] = chunk['count'][in_lexicon].to_numpy()
+            others.update(zip(chunk['word'][~in_lexicon], chunk['count'][~in_lexicon].tolist()))
 
-# convert to list of words
-words = list(data.iloc[:,0])
+            # write this chunk's part of the dictionary, without its surrounding braces
+            if len(chunk) > 0:
+                outfile.write((', ' if kept > 0 else '') +
+                              json.dumps(dict(zip(chunk['word'], chunk['count'].tolist())))[1:-1])
+            kept += len(chunk)
 
-# ensure everything was read in as a string
-words = [str(word) for word in words]
+        outfile.write('}')
 
+    write_frequency_store(counts, base, others=others)
 
-# read in the json to get a dictionary of word frequencies; we'll use this later
-word_freqs = json.load(open('word_freqs.json'))
+    elapsed = time.perf_counter() - t0
 
+    # the most memory the script has used at once (reported in bytes on a Mac, and in kilobytes elsewhere)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak *= 1024
 
+    print('%d rows read, %d words kept, %d of %d lexicon words with a frequency' %
+          (rows, kept, np.count_nonzero(counts), len(base)))
+    print('%.2f s, peak memory %.1f MB' % (elapsed, peak / 1e6))
 
+    return {'rows': rows, 'kept': kept, 'seconds': elapsed, 'peak_memory': peak}
 
 
 
-#### User input #####
+# yields every way to split a word into two pieces that are both valid one-grams
+def compound_splits(word, word_set):
+    for i in range(1, len(word)):
+        if word[:i] in word_set and word[i:] in word_set:
+            yield word[:i], word[i:]
 
 
-# get input from the user for the word of interest
-user_word = input("\nType any word: ")
 
-# set to lowercase
-user_word = user_word.lower()
+# adds one split to the compound index, under both the left piece and the right piece
+def add_compound_split(compound_index, word, left, right):
+    starting = compound_index['starting'].setdefault(left, [])
+    if word not in starting:
+        starting.append(word)
 
+    ending = compound_index['ending'].setdefault(right, [])
+    if word not in ending:
+        ending.append(word)
 
 
 
+# Builds the file compound_index.json, which stores every one-gram that can be split into two valid one-grams
+# The index is stored twice: once keyed by the left piece (the 'starting' words) and once keyed by the right
+# piece (the 'ending' words), so the results for any user word are a direct lookup instead of a search
+# It's built the first time a search needs it (see open_compound_index), and again whenever one_grams.csv is rebuilt
+# from scratch; after that, new words are added to it as they're found (see update_compound_index)
+def build_compound_index(words=None):
+    # read in the one-grams (including any changes saved in the journal) if we weren't given a list of words
+    if words is None:
+        words = list(open_lexicon())
+    word_set = set(words)
 
- 
-#### Manual tweaks to the word list ####
+    compound_index = {'starting': {}, 'ending': {}}
 
+    # try every possible split of every word
+    for word in words:
+        for left, right in compound_splits(word, word_set):
+            add_compound_split(compound_index, word, left, right)
 
-# probably overkill since these changes will always be saved to a file at the end of each run, but to
-# be safe, we'll just make these checks every time we run the script
+    save_compound_index(compound_index)
 
-# words that we noticed are not in the word list that we would like added
-add_words = ['gam']
+    return compound_index
 
-# words that should never be added to the word list, and should be removed if they are already present
-blacklisted_words = []
 
 
-# loop through the words to add; add to the word list if not already present
-for add_word in add_words:
-    if add_word not in words:
-        words.append(add_word)
-        
-        
-# loop through blacklisted words; if present in the word list, remove them
-for blacklisted_word in blacklisted_words:
-    if blacklisted_word in words:
-        words.remove(blacklisted_word)
+# saves the compound index to compound_index.json (see write_atomically)
+def save_compound_index(compound_index, path='compound_index.json'):
+    with write_atomically(path, 'w') as outfile:
+        json.dump(compound_index, outfile)
 
 
-# now we can move on to getting results!
 
+# reads in compound_index.json; returns None if the index hasn't been built yet
+def load_compound_index(path='compound_index.json'):
+    if not os.path.exists(path):
+        return None
 
+    return json.load(open(path))
 
 
 
+# reads in compound_index.json along with the compounds saved in the journal since it was written (see
+# save_lexicon); returns None if the index hasn't been built yet
+# with build, an index that hasn't been built yet is built first, holding the lock like the indexes in
+# open_lexicon_index, so a fresh copy of the script gets one the first time it's needed
+def open_compound_index(lexicon, path='compound_index.json', build=False):
+    if build and not os.path.exists(path):
+        with LexiconLock():
+            # another copy of the script may have built it while we were waiting for the lock
+            if not os.path.exists(path):
+                build_compound_index()
 
-#### Web scraping! ####
+    compound_index = load_compound_index(path)
+    if compound_index is not None:
+        for word, left, right in lexicon.journal_compounds:
+            add_compound_split(compound_index, word, left, right)
+    return compound_index
 
 
 
-## Get starting words ##
+# the journal entries for the compounds made with new one-grams, as ('=', 'left<tab>right') pairs
+def compound_changes(new_words, lexicon):
+    splits = {'starting': {}, 'ending': {}}
+    update_compound_index(splits, new_words, lexicon)
+    return [('=', left + '\t' + word[len(left):]) for left, words in splits['starting'].items() for word in words]
 
-# First, scrape for one-grams that aren't in our existing data set plus two-grams that START with the word
 
-# URL - '/s/' indicates "starting" with the word; append the user's word to get the complete URL
-URL = 'https://www.thefreedictionary.com/s/' + user_word
 
-# get all HTML from the web page
-page = requests.get(URL)
-text = page.text
+# brings the compound index up to date after new one-grams have been added to the lexicon
+# a new word can show up in three ways: it can be split into two pieces itself, it can be the left piece of a
+# longer word, or it can be the right piece of a longer word; only words starting or ending with the new word are checked
+def update_compound_index(compound_index, new_words, lexicon):
+    for new_word in new_words:
+        # the new word itself, split into two valid pieces
+        for left, right in compound_splits(new_word, lexicon):
+            add_compound_split(compound_index, new_word, left, right)
 
-# flag for whether the user entered a valid word; assume valid until proven otherwise
-valid_search = True
+        # longer words that start or end with the new word
+        for word in find_starting(new_word, lexicon.words_with_prefix(new_word), lexicon):
+            add_compound_split(compound_index, word, new_word, word[len(new_word):])
+        for word in find_ending(new_word, lexicon.words_with_suffix(new_word), lexicon):
+            add_compound_split(compound_index, word, word[:-len(new_word)], new_word)
 
-# if a space is present, set search to invalid
-if ' ' in user_word:
-    valid_search = False
 
-try:
-    # "class=suggestions" within the ul html elements is indicative solely of the dictionary results
-    # find the first instance of this (aka the beginning of the results)
-    start_index = [m.start() for m in re.finditer('class=suggestions', text)][0]
-    
-# if we get an IndexError here, it means the word was not found on the free dictionary (i.e., it is not valid)
-# change the valid_search flag to False
-except IndexError:
-    valid_search = False
-    
-    
-# if the word was determined to be invalid above, stop here; if it's valid, proceed with the rest of the script
-if valid_search:
-    # results are returned in several consecutive ul elements with the suggestions tag; find the last ul element of this type
-    last = [m.start() for m in re.finditer('class=suggestions', text)][-1]
-    
-    # next, find all locations with the ul closing tag (not all of these will correspond to a suggestion ul)
-    ends = [m.start() for m in re.finditer('</ul>', text)]
-    
-    # find the location of the first ul closing tag that is after the last suggestion tag
-    # this will indicate the ending location of the suggestions
-    # do this by looping through locations of all ul closing tags
-    for i in ends:
-        # find the first one after the last suggestions tag and then break out of the loop
-        if i > last:
-            end_index = i
-            break
-    
-    # within this subset of the text that we just found above, extract everything that falls between
-    # the end of one tag and a closign anchor tag
-    # this will give us a list of all of the suggestions from the webpage
-    results = re.findall(r'">.*?</a>', text[start_index:end_index])
-    
-    # remove first two characters adn last four characters from each result (the html pieces that we used to find them)
-    # also set all characters to lowercase
-    cleaned_results = [result[2:-4].lower() for result in results]
-    
-    # initialize an empty list to hold the two-grams starting with the user's word
-    two_grams_start = []
-    
-    # loop through all cleaned results/suggestions
-    for result in cleaned_results:
-        # filter out any of the irrelevant results that contain certain punctuation
-        if '-' not in result and '(' not in result and ',' not in result:
-            # split on spaces to get a list of words from our result
-            split_words = result.split(' ')
-            
-            # if one-gram, check if in the one-grams list already
-            if len(split_words) == 1:
-            # if not, add it; if it's already in the list, just move on
-                if result not in words:
-                    words.append(result)
-    
-            # if two-gram, check to make sure it meets our criteria
-            elif len(split_words) == 2:
-                # Check the two criteria: first word must be exactly equal to the user word
-                # AND the second word must be in our one-grams data set
-                if split_words[0] == user_word and split_words[1] in words:
-                    # if it meets both criteria, add to the list; otherwise, just move on
-                    two_grams_start.append(result)
-            
-            
-            # anything else, just skip
-            
-        
-        
-    ## Get ending words ##
-        
-    # repeat the above, but now for two-grams that END with the word
-    
-    
-    # use the '/e/' link to get words ending with our word of interest
-    URL = 'https://www.thefreedictionary.com/e/' + user_word
-    
-    # otherwise, workflow is identical to above
-    
-    # get the HTML from the page
-    page = requests.get(URL)
-    text = page.text
-    
-    
-    # find beginning and end of the suggestions in same manner as above
-    start_index = [m.start() for m in re.finditer('class=suggestions', text)][0]
-    last = [m.start() for m in re.finditer('class=suggestions', text)][-1]
-    
-    ends = [m.start() for m in re.finditer('</ul>', text)]
-    
-    for i in ends:
-        if i > last:
-            end_index = i
-            break
-    
-    # use the indicies found above to collect all suggestions, clean them, and store in a list
-    results = re.findall(r'">.*?</a>', text[start_index:end_index])
-    
-    cleaned_results = [result[2:-4].lower() for result in results]
-    
-    
-    # empty list to store our relevant two-grams
-    two_grams_end = []
-    
-    
-    
-    # loop through all cleaned results
-    for result in cleaned_results:
-        # ignore those containing punctuation
-        if '-' not in result and '(' not in result and ',' not in result:
-            split_words = result.split(' ')
-            # if one-gram, check if in the one-grams list already
-            if len(split_words) == 1:
-            # if not, add it; if it's already in the list, just move on
-                if result not in words:
-                    words.append(result)
-    
-            # if two-gram, check to make sure it meets our criteria
-            elif len(split_words) == 2:
-                # Check the two criteria: second word must be exactly equal to the user word
-                # AND the first word must be in our one-grams data set
-                if split_words[1] == user_word and split_words[0] in words:
-                    # if it meets both criteria, add to the list; otherwise, just move on
-                    two_grams_end.append(result)
-    
-    
-            # if > two-gram, skip
-            
-            
-            
-            
-    
-    
-    #### Combine and organize results for the user ####
-    
-    
-    ## Words that START with the user's word ##
-    
-    # list of all one-grams that start with user_word AND the remainder of the one_gram is also in the list
-    # of acceptable one-grams
-    starting = [word for word in words if (len(word) > len(user_word) and user_word == word[:len(user_word)]
-                                            and word[len(user_word):] in words)]
-    
-    # append the list of two-grams starting with our word to this list
-    starting = starting + two_grams_start
-    
-    
-    # clear starting list of any of our blacklisted words
-    for blacklisted_word in blacklisted_words:
-        if blacklisted_word in starting:
-            starting.remove(blacklisted_word)
-    
-    
-    # build a dataframe of starting words and their frequencies; we'll use this to sort them
-    starting_counts = []
-    
-    # loop through each word in our starting list
-    for word in starting:
-        # start by checking if it's a two-gram
-        if ' ' in word:
-            # if it is, grab the frequency of the non-user word (in this case, the second word)
-            try:
-                word_split = word.split(' ')
-                starting_counts.append(word_freqs[word_split[1]])
-            # if the frequency is not available, just append a zero
-            except KeyError:
-                starting_counts.append(0)
-                
-        # if no space, then it must be a one-gram
-        else:
-            # try to get the frequency of the word directly
-            try:
-                starting_counts.append(word_freqs[word])
-            # if we don't have a frequency available, just append a zero
-            except KeyError:
-                starting_counts.append(0)
-    
-    # create a dataframe from the two lists
-    starting_df = pd.DataFrame({'word':starting, 'counts':starting_counts})
-    
-    # sort the dataframe by counts (descending)
-    starting_df_counts = starting_df.sort_values('counts', ascending = False)
-    
-    ## another version, sorted alphabetically
 
-    # start by creating another column for the dataframe for sorting
-    words_for_sorting = []
-    
-    # loop through each word in the results
-    for word in starting_df['word']:
-        # check if it has a space (aka, if it's a two-gram)
-        if ' ' in word:
-            # if it is, split and rebuild the word without the space
-            word_split = word.split(' ')
-            fixed_word = word_split[0] + word_split[1]
-            
-            # add to the list
-            words_for_sorting.append(fixed_word)
-            
-        else:
-            # if it doesn't have a space, add it to the list as is
-            words_for_sorting.append(word)
-            
-    # add the list to the dataframe as a new column
-    starting_df['word for sorting'] = words_for_sorting
-    
-    # sort by the new column
-    starting_df_alpha = starting_df.sort_values('word for sorting', ascending = True)
-    
-    # overwrite the list of starting words to be this one that we just sorted
-    starting = list(starting_df_alpha['word'])
-    
-    
-    
-    ## Words that END with the user's word
-    
-    # same workflow as above for one-grams ending with our word
-    ending = [word for word in words if (len(word) > len(user_word) and user_word == word[-len(user_word):]
-                                          and word[:-len(user_word)] in words)]
-    
-    # append the list of two-grams ending with our word
-    ending = ending + two_grams_end
-    
-    
-    # clear starting list of any of our blacklisted words
-    for blacklisted_word in blacklisted_words:
-        if blacklisted_word in ending:
-            ending.remove(blacklisted_word)
-    
-    
-    # build a dataframe of ending words and their frequencies; we'll use this to sort them
-    ending_counts = []
-    
-    # loop through each word in our ending list
-    for word in ending:
-        # check if two-gram
-        if ' ' in word:
-            # if it is, grab the frequency of the non-user word (in this case, the first word)
-            try: 
-                word_split = word.split(' ')
-                ending_counts.append(word_freqs[word_split[0]])
-            # if the frequency is not available, just append a zero
-            except KeyError:
-                ending_counts.append(0)
-        
-        # otherwise must be a one-gram
-        else:
-            # try to pull the word's frequency from the dictionary and add to our list of counts
-            try:
-                ending_counts.append(word_freqs[word])
-            # if we don't have a frequency available, just append a zero
-            except KeyError:
-                ending_counts.append(0)
-    
-    # create a dataframe from the two lists
-    ending_df = pd.DataFrame({'word':ending, 'counts':ending_counts})
-    
-    # sort the dataframe by counts (descending)
-    ending_df_counts = ending_df.sort_values('counts', ascending = False)
-    
-    ## another version, sorted alphabetically
+# returns the precomputed (starting, ending) one-grams for the user's word
+# copies are returned so that changes to the results never leak back into the index
+def lookup_compounds(compound_index, user_word):
+    starting = list(compound_index['starting'].get(user_word, []))
+    ending = list(compound_index['ending'].get(user_word, []))
+    return starting, ending
 
-    # start by creating another column for the dataframe for sorting
-    words_for_sorting = []
-    
-    # loop through each word in the results
-    for word in ending_df['word']:
-        # check if it has a space (aka, if it's a two-gram)
-        if ' ' in word:
-            # if it is, split and rebuild the word without the space
-            word_split = word.split(' ')
-            fixed_word = word_split[0] + word_split[1]
-            
-            # add to the list
-            words_for_sorting.append(fixed_word)
-            
-        else:
-            # if it doesn't have a space, add it to the list as is
-            words_for_sorting.append(word)
-            
-    # add the list to the dataframe as a new column
-    ending_df['word for sorting'] = words_for_sorting
-    
-    # sort by the new column
-    ending_df_alpha = ending_df.sort_values('word for sorting', ascending = True)
-    
-    # overwrite the list of ending words to be this one that we just sorted
-    ending = list(ending_df_alpha['word'])
-    
-    
-    
-    
-    
-    
-    #### Print the finalized results to the console ####
-    
-    # start with displaying the user's word
-    print()
-    print()
-    print('Printing results ALPHABETICALLY:')
-    print()
-    print('Words with "' + user_word + '"')
-    print()
-    
-    # table header
-    print('At the end (%-34s              At the beginning (%-16s' % (str(len(ending)) + ' results)', str(len(starting)) + ' results)'))
-    print('---------------------------------------------------------------------------------------------------')
-    
-    # show lists side by side, which means the number of rows in our table = length of the longer list (starting vs. ending)
-    for i in range(max(len(starting), len(ending))):
-        try:
-            # start with fetching the beginning piece of words ENDING with our word
-            w1 = ending[i][:-len(user_word)]
-            # then fetch the entire word all together
-            w2 = ending[i]
-        # if we get an error, it means this list was the shorter of the two; just use blank spaces
-        except IndexError:
-            w1 = ''
-            w2 = ''
-            
-        try:
-            # start with fetching the entire word
-            w3 = starting[i]
-            # next fetch the end of the word that is left after removing user_word at the beginning
-            w4 = starting[i][len(user_word):]
-            # check for the presence of a space
-            if ' ' in starting[i]:
-                # if we find one, it means this is a two-word phrase, so remove the space from the stem
-                w4 = starting[i][len(user_word)+1:]
-            
-        # if we get an error, it means this list was the shorter of the two; just use blank spaces
-        except IndexError:
-            w3 = ''
-            w4 = ''
-        
-        
-        # when we're out of words in the first column, but still have words to print in the second
-        # column; avoids printing the arrow between the blank spaces
-        if len(w1) == 0 and len(w2) == 0:
-            print('%-14s       %-38s %-20s -->   %-15s' % (w1, w2, w3, w4))
-        
-        # same as above, but for when we have something to print in the first column but not the second
-        elif len(w3) == 0 and len(w4) == 0:
-            print('%-14s -->   %-38s'  % (w1, w2))
-        
-        # this is essentially the default: when we have an entry to print in both columns
-        else:
-            print('%-14s -->   %-38s %-20s -->   %-15s' % (w1, w2, w3, w4))
-    
-    
-    
-    
-    
-    
-    #### Last check and save final results ####
-    
-    # one last check to clean out any blacklisted words before we export to a file
-    for blacklisted_word in blacklisted_words:
-        if blacklisted_word in words:
-            words.remove(blacklisted_word)
-    
-    
-    
-    #### at the end, rewrite the data files to save any changes that were made ####
-    words_df = pd.DataFrame(words)
-    words_df.to_csv('one_grams.csv', index=False)
+
+
+# The binary lexicon, one_grams.lex, holds the same words as one_grams.csv in a form that can be opened instantly
+# and shared between every copy of the script that's running, instead of being read into memory each time.
+# The words are sorted and stored back to back as one long string of bytes, alongside a table of where each
+# word starts, so any word can be found with a binary search. A second table lists the words in order of their
+# reversed spelling, so words ending with a given suffix can be found the same way.
+#
+# The build ID is a checksum of the words, so files that depend on the word IDs (like word_freqs.bin) can tell
+# whether they were built for this version of the lexicon.
+#
+# file layout (all numbers are 4-byte unsigned integers):
+#   magic (8 bytes) | number of words n | build ID | n+1 word offsets | n suffix-ordered word IDs | word bytes
+LEXICON_MAGIC = b'WPLEX\x00\x00\x01'
+
+
+
+# reads one_grams.csv into a list of words, without pandas; the first line is the column header
+def read_one_grams(path='one_grams.csv'):
+    with open(path, newline='', encoding='utf-8') as infile:
+        reader = csv.reader(infile)
+        next(reader, None)
+        return [row[0] for row in reader if len(row) > 0]
 
 
 
-# only reach this point if the user's word was invalid; print message to the console
-else:
-    print('\nNo matches found! Double check that you\'ve entered a valid word and try again.')
-    print('Remember not to include any punctuation or spaces!')
+# builds one_grams.lex out of a list of words (by default, the words in one_grams.csv)
+# the new file is swapped in whole (see write_atomically), so any script that already has the old file open keeps
+# reading it safely
+def build_binary_lexicon(words=None, path='one_grams.lex'):
+    if words is None:
+        words = read_one_grams()
 
+    with write_atomically(path) as outfile:
+        outfile.write(encode_binary_lexicon(words))
+
+
+
+# the contents of a binary lexicon file for a list of words, as bytes
+def encode_binary_lexicon(words):
+    # sort and remove duplicates; UTF-8 bytes sort in the same order as the strings themselves
+    encoded = sorted(set(word.encode('utf-8') for word in words))
+
+    # where each word starts (and, at the very end, where the last word stops)
+    offsets = array('I', [0])
+    total = 0
+    for word in encoded:
+        total += len(word)
+        offsets.append(total)
+
+    # word IDs ordered by the reversed bytes of each word, for the suffix searches
+    suffix_order = array('I', sorted(range(len(encoded)), key=lambda i: encoded[i][::-1]))
+
+    data = b''.join(encoded)
+
+    return b''.join([LEXICON_MAGIC, array('I', [len(encoded), zlib.crc32(offsets.tobytes() + data)]).tobytes(),
+                     offsets.tobytes(), suffix_order.tobytes(), data])
+
+
+
+# A read-only view of one_grams.lex. The file is memory-mapped, so opening it reads nothing up front, and the
+# operating system shares the same memory between every process that has it open.
+# Each word has an ID: its position in sorted order.
+# A binary lexicon can also be stored inside another file (word_freqs.bin does this), starting at byte start.
+class MappedLexicon:
+    def __init__(self, path='one_grams.lex', start=0):
+        with open(path, 'rb') as infile:
+            self.map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[start:start + 8] != LEXICON_MAGIC:
+            raise ValueError(path + ' is not a binary lexicon file')
+
+        view = memoryview(self.map)
+        self.count, self.build_id = view[start + 8:start + 16].cast('I')
+
+        # the two tables of numbers, read directly out of the mapped file
+        start += 16
+        self.offsets = view[start:start + 4 * (self.count + 1)].cast('I')
+        start += 4 * (self.count + 1)
+        self.suffix_order = view[start:start + 4 * self.count].cast('I')
+        self.data_start = start + 4 * self.count
+
+    def __len__(self):
+        return self.count
+
+    # the raw bytes of the word with the given ID
+    def word_bytes(self, word_id):
+        return self.map[self.data_start + self.offsets[word_id]:self.data_start + self.offsets[word_id + 1]]
+
+    def __getitem__(self, word_id):
+        if not 0 <= word_id < self.count:
+            raise IndexError('word ID out of range')
+        return self.word_bytes(word_id).decode('utf-8')
+
+    def __iter__(self):
+        for word_id in range(self.count):
+            yield self.word_bytes(word_id).decode('utf-8')
+
+    # position of the first word that isn't less than key (as bytes); with reverse=True, the position in the
+    # suffix order of the first word whose reversed bytes aren't less than key
+    def lower_bound(self, key, reverse=False):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if reverse:
+                word = self.word_bytes(self.suffix_order[mid])[::-1]
+            else:
+                word = self.word_bytes(mid)
+            if word < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # the ID of a word, or None if it's not in the lexicon
+    def word_id(self, word):
+        key = word.encode('utf-8')
+        i = self.lower_bound(key)
+        if i < self.count and self.word_bytes(i) == key:
+            return i
+        return None
+
+    def __contains__(self, word):
+        return self.word_id(word) is not None
+
+    # the range of IDs of every word starting with the prefix
+    # no UTF-8 text ever contains the byte 0xff, so every word starting with the prefix sorts before prefix + 0xff
+    def prefix_range(self, prefix):
+        key = prefix.encode('utf-8')
+        return range(self.lower_bound(key), self.lower_bound(key + b'\xff'))
+
+    def words_with_prefix(self, prefix):
+        return [self[i] for i in self.prefix_range(prefix)]
+
+    # the IDs of every word ending with the suffix, found the same way using the reversed bytes
+    def suffix_ids(self, suffix):
+        key = suffix.encode('utf-8')[::-1]
+        positions = range(self.lower_bound(key, reverse=True), self.lower_bound(key + b'\xff', reverse=True))
+        return [self.suffix_order[i] for i in positions]
+
+    def words_with_suffix(self, suffix):
+        return [self[word_id] for word_id in self.suffix_ids(suffix)]
+
+
+
+# A read-only, memory-mapped view of one of the files built from the binary lexicon base: the frequency store and
+# the suffix array, spelling, pattern and anagram indexes. Each file starts with its magic bytes and a header of
+# header_size 4-byte numbers (read into self.header), followed by its tables, which are read out of the mapped file
+# in order with next_table. Every file saves the build ID of the lexicon it was built for, so it can tell whether
+# it still lines up with it.
+class MappedIndex:
+    magic = None
+    description = None
+    header_size = 2
+
+    def __init__(self, base, path):
+        self.base = base
+
+        with open(path, 'rb') as infile:
+            self.map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:8] != self.magic:
+            raise ValueError(path + ' is not ' + self.description)
+
+        self.view = memoryview(self.map)
+        self.header = self.view[8:8 + 4 * self.header_size].cast('I')
+        self.table_start = 8 + 4 * self.header_size
+
+    # the next table of the file: count numbers, each 4 bytes (typecode 'I') or 8 bytes ('Q')
+    def next_table(self, count, typecode='I'):
+        size = count * array(typecode).itemsize
+        table = self.view[self.table_start:self.table_start + size].cast(typecode)
+        self.table_start += size
+        return table
+
+    # whether this file lines up with the word IDs of its lexicon
+    def matches_lexicon(self):
+        return self.build_id == self.base.build_id
+
+
+
+# The word list used while the script runs: the binary lexicon, plus any words added or removed since it was built
+# (new one-grams from the web), plus the curation lists (see curate). It behaves like a set of words that can also
+# search by prefix and suffix.
+# Every change made during the run is also kept in the list changes, as ('+', word) or ('-', word), so it can be
+# written to the journal (see append_to_journal). The curation lists are never written to the journal; they're
+# applied on top every time the lexicon is opened.
+class Lexicon:
+    def __init__(self, base):
+        self.base = base
+        self.added = []
+        self.added_set = set()
+        self.removed = set()
+        self.changes = []
+
+        # how many changes are in the journal on disk; see save_lexicon
+        self.journal_length = 0
+
+        # the compounds saved in the journal, as (word, left, right); see open_compound_index
+        self.journal_compounds = []
+
+        # the curation lists: words to add that aren't otherwise in the lexicon, and words to leave out
+        self.curated = []
+        self.curated_set = set()
+        self.blacklist = set()
+        self.blacklisted_count = 0
+
+        # the compound index doesn't include the curated words, so their compounds are kept here for each run,
+        # in the same format (see load_data)
+        self.curated_compounds = {'starting': {}, 'ending': {}}
+
+    # applies the curation lists on top of the lexicon: every word in add_words is included, and every word in
+    # blacklisted_words is left out (and never added from the web)
+    def curate(self, add_words, blacklisted_words):
+        self.blacklist = set(blacklisted_words)
+        self.blacklisted_count = sum(1 for word in self.blacklist if self.has_saved(word))
+        self.curated = [word for word in dict.fromkeys(add_words)
+                        if word not in self.blacklist and not self.has_saved(word)]
+        self.curated_set = set(self.curated)
+
+    # whether a word is in the lexicon, ignoring the curation lists
+    def has_saved(self, word):
+        if word in self.added_set:
+            return True
+        return word not in self.removed and word in self.base
+
+    def __contains__(self, word):
+        if word in self.blacklist:
+            return False
+        if word in self.curated_set:
+            return True
+        return self.has_saved(word)
+
+    # the words that aren't in the binary lexicon: the ones added since it was built, and the curated ones
+    def extra_words(self):
+        return self.added + self.curated
+
+    # adds a word; returns True if it wasn't already in the lexicon (blacklisted words are never added)
+    def add(self, word):
+        if word in self.blacklist or self.has_saved(word):
+            return False
+
+        if word in self.removed:
+            self.removed.discard(word)
+        else:
+            self.added.append(word)
+            self.added_set.add(word)
+
+        self.changes.append(('+', word))
+        return True
+
+    # removes a word; returns True if it was in the lexicon (not counting the curation lists)
+    def discard(self, word):
+        if not self.has_saved(word):
+            return False
+
+        if word in self.added_set:
+            self.added.remove(word)
+            self.added_set.discard(word)
+        else:
+            self.removed.add(word)
+
+        self.changes.append(('-', word))
+        return True
+
+    # every word in the lexicon, ignoring the curation lists; this is what's saved to one_grams.csv
+    def saved_words(self):
+        for word in self.base:
+            if word not in self.removed:
+                yield word
+        yield from self.added
+
+    def __iter__(self):
+        for word in self.saved_words():
+            if word not in self.blacklist:
+                yield word
+        yield from self.curated
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.added) - self.blacklisted_count + len(self.curated)
+
+    def words_with_prefix(self, prefix):
+        return ([word for word in self.base.words_with_prefix(prefix)
+                 if word not in self.removed and word not in self.blacklist] +
+                [word for word in self.extra_words() if word.startswith(prefix) and word not in self.blacklist])
+
+    def words_with_suffix(self, suffix):
+        return ([word for word in self.base.words_with_suffix(suffix)
+                 if word not in self.removed and word not in self.blacklist] +
+                [word for word in self.extra_words() if word.endswith(suffix) and word not in self.blacklist])
+
+
+
+# The journal, one_grams.journal, lists every change made to the lexicon since one_grams.csv was last rewritten,
+# one per line: '+word' for a word that was added and '-word' for a word that was removed, plus '=left<tab>right'
+# for each compound made with the new words, which isn't in compound_index.json yet. Runs only ever append to it, so
+# saving a few new words never means rewriting the whole word list (or the compound index). Every so often (once
+# there are JOURNAL_COMPACT_AT changes) the journal is folded back into one_grams.csv and compound_index.json and
+# emptied; see compact_lexicon.
+# The first line, '#<build ID>', says which version of one_grams.lex the changes were saved on top of.
+JOURNAL_PATH = 'one_grams.journal'
+JOURNAL_COMPACT_AT = 1000
+
+# Many copies of the script can run at once, so every change to the lexicon's files (adding to the journal and
+# compacting it) happens while holding a lock on this file. Each copy adds its own
+# changes to whatever is on disk at the time, so nothing another copy saved in the meantime is ever lost.
+# Reading never takes the lock; see open_lexicon.
+LOCK_PATH = 'one_grams.lock'
+
+
+
+# The lock on LOCK_PATH, used as "with LexiconLock():". Only one process can hold it at a time; the others wait.
+# Within a process it can be taken again by code that already holds it (compact_lexicon inside save_lexicon, say),
+# and threads take turns.
+class LexiconLock:
+    thread_lock = threading.RLock()
+    depth = 0
+    file = None
+
+    def __init__(self, path=LOCK_PATH):
+        self.path = path
+
+    def __enter__(self):
+        import fcntl
+
+        LexiconLock.thread_lock.acquire()
+        if LexiconLock.depth == 0:
+            LexiconLock.file = open(self.path, 'a')
+            fcntl.flock(LexiconLock.file, fcntl.LOCK_EX)
+        LexiconLock.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        import fcntl
+
+        LexiconLock.depth -= 1
+        if LexiconLock.depth == 0:
+            fcntl.flock(LexiconLock.file, fcntl.LOCK_UN)
+            LexiconLock.file.close()
+            LexiconLock.file = None
+        LexiconLock.thread_lock.release()
+
+
+
+# the build ID of the binary lexicon on disk, read from its header without opening the rest of it
+def lexicon_build_id(path='one_grams.lex'):
+    with open(path, 'rb') as infile:
+        header = infile.read(16)
+    return array('I', header[8:16])[1]
+
+
+
+# reads the journal; returns the build ID it was saved on top of (None if there's no journal, or it's from before
+# journals had one) and a list of (change, word) pairs, where change is '+', '-' or '=' (with 'left<tab>right' as
+# the word)
+# the journal may be added to while we're reading it, so a last line without a newline yet is left for next time
+# (or removed, by another copy of the script compacting the lexicon)
+def read_journal(path=JOURNAL_PATH):
+    try:
+        with open(path, encoding='utf-8') as infile:
+            lines = infile.read().split('\n')[:-1]
+    except FileNotFoundError:
+        return None, []
+
+    build_id = None
+    if len(lines) > 0 and lines[0].startswith('#'):
+        build_id = int(lines[0][1:])
+
+    return build_id, [(line[0], line[1:]) for line in lines if line[:1] in ('+', '-', '=')]
+
+
+
+# adds changes to the end of the journal, in a single write, and returns how many changes the journal now holds
+# (including the ones other copies of the script have saved)
+def append_to_journal(changes, path=JOURNAL_PATH, lexicon_path='one_grams.lex'):
+    with LexiconLock():
+        with open(path, 'a+b') as outfile:
+            outfile.seek(0)
+            journal = outfile.read()
+
+            # a new journal starts with the build ID of the lexicon it goes on top of; a line left half-written by
+            # a run that stopped partway is finished off first, so it doesn't run into our first change
+            if len(journal) == 0:
+                outfile.write(b'#%d\n' % lexicon_build_id(lexicon_path))
+            elif not journal.endswith(b'\n'):
+                outfile.write(b'\n')
+            outfile.write(''.join(change + word + '\n' for change, word in changes).encode('utf-8'))
+
+    return sum(1 for line in journal.split(b'\n') if line[:1] in (b'+', b'-', b'=')) + len(changes)
+
+
+
+# opens the lexicon for the script to use, rebuilding one_grams.lex first if one_grams.csv has changed since,
+# and then replaying the journal over it so it includes every change saved since one_grams.csv was written
+# This doesn't take the lock, so reading never waits on another copy of the script saving. The one exception is if
+# another copy compacts the lexicon while we're reading: then the journal won't match the one_grams.lex we opened
+# (or one_grams.lex will have been replaced since), so we wait for the compaction to finish and read both again.
+# Either way, the lexicon is always a complete snapshot of one moment.
+def open_lexicon(csv_path='one_grams.csv', path='one_grams.lex', journal_path=JOURNAL_PATH):
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        build_binary_lexicon(read_one_grams(csv_path), path)
+
+    base = MappedLexicon(path)
+    build_id, journal = read_journal(journal_path)
+    if build_id not in (None, base.build_id) or lexicon_build_id(path) != base.build_id:
+        # nothing can change while we hold the lock; if the journal still doesn't match, it was left behind by a
+        # compaction that stopped partway, and replaying it over the new one_grams.lex is still right
+        with LexiconLock():
+            base = MappedLexicon(path)
+            build_id, journal = read_journal(journal_path)
+
+    lexicon = Lexicon(base)
+    for change, word in journal:
+        if change == '+':
+            lexicon.add(word)
+        elif change == '-':
+            lexicon.discard(word)
+        else:
+            left, right = word.split('\t')
+            lexicon.journal_compounds.append((left + right, left, right))
+
+    # these changes are already saved in the journal, so there's no need to save them again
+    lexicon.changes = []
+    lexicon.journal_length = len(journal)
+
+    return lexicon
+
+
+
+# folds the journal back into the base files: one_grams.csv is rewritten with every word in the lexicon, one_grams.lex
+# and the frequency store are rebuilt to match, the compounds are saved into compound_index.json, and the journal
+# is emptied
+# this happens automatically once the journal gets long enough, but can also be run by hand at any time
+# the lexicon is read fresh from disk while holding the lock, so the changes every copy of the script has saved are
+# kept, not just the ones made by whichever copy happens to compact it
+# the indexes built from one_grams.lex take several seconds each, so they're left out of the lock; they're rebuilt
+# the next time they're opened (see open_lexicon_index), or straight afterwards with rebuild_indexes (like --compact)
+def compact_lexicon(rebuild_indexes=False):
+    with LexiconLock():
+        lexicon = open_lexicon()
+        all_words = list(lexicon.saved_words())
+        compound_index = open_compound_index(lexicon)
+
+        # the frequencies are kept word by word, since the word IDs are about to change
+        word_freqs = saved_frequencies()
+
+        # each file is written under a temporary name and then swapped in, so nothing is ever left half-written;
+        # if we stop partway through, replaying the journal over the new files again changes nothing
+        write_one_grams(all_words)
+        build_binary_lexicon(all_words)
+        if compound_index is not None:
+            save_compound_index(compound_index)
+        if os.path.exists(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+
+        # if the words changed, so did the word IDs, so line the frequency store back up with the new lexicon
+        build_frequency_store(word_freqs)
+
+    # bring the indexes that have already been built up to date with the new lexicon; the ones that aren't there yet
+    # are built the first time they're needed
+    if rebuild_indexes:
+        lexicon = open_lexicon()
+        for path, open_index in [('one_grams.sfx', open_suffix_array), ('one_grams.del', open_spelling_index),
+                                 ('one_grams.pat', open_pattern_index), ('one_grams.ana', open_anagram_index)]:
+            if os.path.exists(path):
+                open_index(lexicon)
+
+
+
+# opens one of the indexes built from the binary lexicon (the suffix array, spelling index, pattern index or anagram
+# index), as index_type(lexicon.base, path)
+# the file only needs building here if it's missing or was built for a different version of the lexicon (e.g. after
+# compact_lexicon); that's done holding the lock, so it never happens in the middle of a compaction, and two copies
+# of the script never build the same file at once
+def open_lexicon_index(lexicon, index_type, build_index, path):
+    if os.path.exists(path):
+        index = index_type(lexicon.base, path)
+        if index.matches_lexicon():
+            return index
+
+    with LexiconLock():
+        # another copy of the script may have built it while we were waiting for the lock
+        if os.path.exists(path):
+            index = index_type(lexicon.base, path)
+            if index.matches_lexicon():
+                return index
+
+        build_index(path=path)
+        return index_type(lexicon.base, path)
+
+
+
+# compares reading one_grams.csv with pandas (the original approach) against opening the binary lexicon
+# this is only needed to check the speed and memory use of startup; leaving it here for reference
+def benchmark_lexicon_load(seed_words=['bird', 'water', 'light', 'zebra', 'qqqq']):
+    import tracemalloc
+    import pandas as pd
+
+    # make sure the binary lexicon is up to date before timing it
+    open_lexicon()
+
+    tracemalloc.start()
+
+    # original approach: a DataFrame, copied into a list of strings, plus a set for membership checks
+    t0 = time.perf_counter()
+    words = [str(word) for word in list(pd.read_csv('one_grams.csv').iloc[:,0])]
+    word_set = set(words)
+    csv_time = time.perf_counter() - t0
+    csv_memory = tracemalloc.get_traced_memory()[0]
+
+    del words, word_set
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    # new approach: map the binary file
+    t0 = time.perf_counter()
+    lexicon = MappedLexicon()
+    mapped_time = time.perf_counter() - t0
+    mapped_memory = tracemalloc.get_traced_memory()[0] - baseline
+
+    tracemalloc.stop()
+
+    # a few lookups, to show they're still fast without the set
+    t0 = time.perf_counter()
+    for word in seed_words:
+        word in lexicon
+        lexicon.words_with_prefix(word)
+        lexicon.words_with_suffix(word)
+    lookup_time = (time.perf_counter() - t0) / len(seed_words)
+
+    print('pandas + list + set:  %.3f seconds, %.1f MB' % (csv_time, csv_memory / 2**20))
+    print('binary lexicon:       %.6f seconds, %.3f MB' % (mapped_time, mapped_memory / 2**20))
+    print('membership + prefix + suffix lookup: %.3f ms per word' % (lookup_time * 1000))
+
+
+
+# The frequency store, word_freqs.bin, holds the frequency of every word in the binary lexicon as one long array
+# of numbers, where a word's frequency sits at the position of its lexicon word ID. Like the lexicon, it's
+# memory-mapped instead of being read in, and looking up a frequency is just indexing into the array.
+# The lexicon's build ID is saved with it, so we can tell when the lexicon has changed and the store needs rebuilding.
+# It also holds the frequencies of m other words that aren't in the binary lexicon (yet), stored as a small binary
+# lexicon of their own, so words added through the journal or the curation lists have a frequency too.
+#
+# file layout: magic (8 bytes) | number of words n (4 bytes) | lexicon build ID (4 bytes) | number of other words m
+#              (4 bytes) | 4 empty bytes | n counts (8 bytes each) | m counts (8 bytes each) | binary lexicon of the
+#              other words
+FREQUENCY_MAGIC = b'WPFRQ\x00\x00\x02'
+
+
+
+# the frequencies to build a new frequency store from, as {word: frequency}: the ones in the current store, as long
+# as it lines up with one_grams.lex (so rebuilding the lexicon keeps them, word by word), or else word_freqs.json;
+# if there's neither, an empty dictionary, and every word gets a zero
+def saved_frequencies(path='word_freqs.bin', lexicon_path='one_grams.lex'):
+    if os.path.exists(path) and os.path.exists(lexicon_path):
+        try:
+            frequencies = FrequencyStore(MappedLexicon(lexicon_path), path)
+        except ValueError:
+            frequencies = None
+        if frequencies is not None and frequencies.matches_lexicon():
+            return frequencies.as_dict()
+
+    if os.path.exists('word_freqs.json'):
+        return json.load(open('word_freqs.json'))
+
+    return {}
+
+
+
+# builds word_freqs.bin for the current binary lexicon out of a {word: frequency} dictionary
+# (by default, see saved_frequencies)
+def build_frequency_store(word_freqs=None, lexicon_path='one_grams.lex', path='word_freqs.bin'):
+    if word_freqs is None:
+        word_freqs = saved_frequencies(path, lexicon_path)
+
+    base = MappedLexicon(lexicon_path)
+
+    # one count per word ID; words without a frequency get a zero
+    counts = array('Q', (word_freqs.get(word, 0) for word in base))
+
+    base_words = set(base)
+    others = {word: count for word, count in word_freqs.items() if word not in base_words}
+
+    write_frequency_store(counts, base, path, others)
+
+
+
+# writes word_freqs.bin from an array of counts (array or numpy), one per word ID of the binary lexicon base, and
+# a {word: frequency} dictionary of other words that aren't in it
+# the file is written under a temporary name and then swapped in, so it's never left half-written
+def write_frequency_store(counts, base, path='word_freqs.bin', others={}):
+    # the other words' counts go in the order of their own word IDs
+    other_words = sorted(others, key=lambda word: word.encode('utf-8'))
+
+    with write_atomically(path) as outfile:
+        outfile.write(FREQUENCY_MAGIC)
+        outfile.write(array('I', [len(base), base.build_id, len(other_words), 0]).tobytes())
+        outfile.write(counts.tobytes())
+        outfile.write(array('Q', (others[word] for word in other_words)).tobytes())
+        outfile.write(encode_binary_lexicon(other_words))
+
+
+
+# A read-only, memory-mapped view of word_freqs.bin for the lexicon it was built for (see MappedIndex)
+class FrequencyStore(MappedIndex):
+    magic = FREQUENCY_MAGIC
+    description = 'a frequency store file'
+    header_size = 4
+
+    def __init__(self, base, path='word_freqs.bin'):
+        super().__init__(base, path)
+
+        count, self.build_id, other_count, unused = self.header
+        self.counts = self.next_table(count, 'Q')
+        self.other_counts = self.next_table(other_count, 'Q')
+        self.others = MappedLexicon(path, self.table_start)
+
+        # the frequencies of the words in the lexicon that aren't in the binary lexicon; see add_extra_words
+        self.extra = {}
+
+    def matches_lexicon(self):
+        return super().matches_lexicon() and len(self.counts) == len(self.base)
+
+    # looks up the frequencies of words that aren't in the binary lexicon (the lexicon's extra_words) once, so
+    # they're a dictionary lookup from then on
+    def add_extra_words(self, words):
+        for word in words:
+            word_id = self.others.word_id(word)
+            self.extra[word] = 0 if word_id is None else self.other_counts[word_id]
+
+    # the frequency of a word, or zero if we don't have one
+    def get(self, word):
+        word_id = self.base.word_id(word)
+        if word_id is not None:
+            return self.counts[word_id]
+        if word in self.extra:
+            return self.extra[word]
+
+        word_id = self.others.word_id(word)
+        return 0 if word_id is None else self.other_counts[word_id]
+
+    # the frequencies of every word in the binary lexicon starting with the prefix, or ending with the suffix, as
+    # {word: frequency}; these are read straight off the word IDs, so they cost one binary search each, rather than
+    # one per word (see sort_results)
+    def with_prefix(self, prefix):
+        return {self.base[word_id]: self.counts[word_id] for word_id in self.base.prefix_range(prefix)}
+
+    def with_suffix(self, suffix):
+        return {self.base[word_id]: self.counts[word_id] for word_id in self.base.suffix_ids(suffix)}
+
+    # every frequency in the store (words in the binary lexicon and others) as {word: frequency}, leaving out zeros
+    def as_dict(self):
+        found = {word: self.other_counts[word_id] for word_id, word in enumerate(self.others)}
+        found.update((word, self.counts[word_id]) for word_id, word in enumerate(self.base))
+        return {word: count for word, count in found.items() if count > 0}
+
+
+
+# opens the frequency store for the lexicon, rebuilding word_freqs.bin first if it's missing or was built for a
+# different version of the lexicon (from word_freqs.json if there is one; otherwise every word gets a zero)
+def open_frequencies(lexicon, path='word_freqs.bin'):
+    frequencies = None
+    if os.path.exists(path):
+        try:
+            frequencies = FrequencyStore(lexicon.base, path)
+        except ValueError:
+            frequencies = None
+
+    if frequencies is None or not frequencies.matches_lexicon():
+        build_frequency_store(path=path)
+        frequencies = FrequencyStore(lexicon.base, path)
+
+    frequencies.add_extra_words(lexicon.extra_words())
+    return frequencies
+
+
+
+# compares reading word_freqs.json into a dictionary (the original approach) against opening the frequency store
+# this is only needed to check the speed and memory use of loading the frequencies; leaving it here for reference
+def benchmark_frequency_load(seed_words=['bird', 'water', 'light', 'house', 'fire']):
+    import tracemalloc
+
+    # make sure both the lexicon and the frequency store are up to date before timing them
+    lexicon = open_lexicon()
+    open_frequencies(lexicon)
+
+    tracemalloc.start()
+
+    # original approach: the whole json file as a dictionary
+    t0 = time.perf_counter()
+    word_freqs = json.load(open('word_freqs.json'))
+    json_time = time.perf_counter() - t0
+    json_memory = tracemalloc.get_traced_memory()[0]
+
+    del word_freqs
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    # new approach: map the frequency store
+    t0 = time.perf_counter()
+    frequencies = FrequencyStore(MappedLexicon())
+    store_time = time.perf_counter() - t0
+    store_memory = tracemalloc.get_traced_memory()[0] - baseline
+
+    tracemalloc.stop()
+
+    print('word_freqs.json dictionary: %.3f seconds, %.1f MB' % (json_time, json_memory / 2**20))
+    print('word_freqs.bin store:       %.6f seconds, %.3f MB' % (store_time, store_memory / 2**20))
+    print('Saved %.3f seconds and %.1f MB' % (json_time - store_time, (json_memory - store_memory) / 2**20))
+    for word in seed_words:
+        print('%-10s %12d' % (word, frequencies.get(word)))
+
+
+
+
+# one-grams that start with user_word where the remainder of the one-gram is also in the set of valid words
+# candidates are the words starting with user_word (e.g. from the lexicon's words_with_prefix)
+def find_starting(user_word, candidates, word_set):
+    return [word for word in candidates
+            if len(word) > len(user_word) and word[len(user_word):] in word_set]
+
+
+
+# one-grams that end with user_word where the beginning of the one-gram is also in the set of valid words
+# candidates are the words ending with user_word (e.g. from the lexicon's words_with_suffix)
+def find_ending(user_word, candidates, word_set):
+    return [word for word in candidates
+            if len(word) > len(user_word) and word[:-len(user_word)] in word_set]
+
+
+
+# Segmentation finds every way to break a word into pieces that are all valid one-grams, e.g. "wheelchairman" into
+# "wheel" + "chair" + "man" or "wheelchair" + "man".
+# First, the pieces that start at each position of the word are found by walking the word through the lexicon like
+# a trie (the lexicon is sorted, so all words starting with the same letters sit next to each other); the walk from
+# a position stops as soon as no word in the lexicon starts with the letters so far. Then the segmentations are put
+# together from the end of the word back to the start, remembering the answer for each position and number of parts
+# left, so each one is only worked out once however many ways there are to reach it.
+
+# returns a list where item i is the list of positions j such that word[i:j] is a one-gram at least min_part_length
+# letters long
+def piece_ends(word, lexicon, min_part_length=1):
+    ends = []
+
+    for i in range(len(word)):
+        ends.append([])
+        for j in range(i + 1, len(word) + 1):
+            piece = word[i:j]
+
+            # stop once nothing in the lexicon starts with the piece (words added since the lexicon was built
+            # aren't in its sorted order, so check those separately)
+            if (len(lexicon.base.prefix_range(piece)) == 0 and
+                    not any(extra.startswith(piece) for extra in lexicon.extra_words())):
+                break
+
+            if j - i >= min_part_length and piece in lexicon:
+                ends[i].append(j)
+
+    return ends
+
+
+
+# returns every way to split word into between min_parts and max_parts one-grams, each at least min_part_length
+# letters long, as a list of tuples of the pieces
+def segment_word(word, lexicon, min_parts=2, max_parts=4, min_part_length=1):
+    ends = piece_ends(word, lexicon, min_part_length)
+
+    # segmentations of word[i:] into at most parts_left pieces, worked out once for each (i, parts_left)
+    memo = {}
+
+    def segmentations(i, parts_left):
+        if i == len(word):
+            return [()]
+        if parts_left == 0:
+            return []
+
+        if (i, parts_left) not in memo:
+            memo[(i, parts_left)] = [(word[i:j],) + rest
+                                     for j in ends[i]
+                                     for rest in segmentations(j, parts_left - 1)]
+        return memo[(i, parts_left)]
+
+    return [parts for parts in segmentations(0, max_parts) if len(parts) >= min_parts]
+
+
+
+# Sorts segmentations so the most likely ones come first: a segmentation is only as common as its rarest piece,
+# so they're ranked by the frequency of their least common piece (most common first), and then by the number of
+# pieces (fewest first). Returns a list of (parts, frequency) tuples; with top, only the top best are kept.
+def rank_segmentations(segmentations, frequencies, top=None):
+    scored = [(parts, min(frequencies.get(part) for part in parts)) for parts in segmentations]
+
+    def key(item):
+        return (-item[1], len(item[0]))
+
+    if top is not None and top < len(scored):
+        return heapq.nsmallest(top, scored, key=key)
+    return sorted(scored, key=key)
+
+
+
+# prints the ranked segmentations of the user's word (see rank_segmentations)
+def print_segmentations(user_word, ranked, total=None):
+    if total is None:
+        total = len(ranked)
+
+    print()
+    print()
+    print('Ways to split "%s" into words (%d results, most common first):' % (user_word, total))
+    print()
+    print('%-60s %s' % ('Pieces', 'Least common piece'))
+    print('---------------------------------------------------------------------------------------------------')
+
+    for parts, frequency in ranked:
+        print('%-60s %d' % (' + '.join(parts), frequency))
+
+
+
+# The anagram index, one_grams.ana, answers two kinds of puzzle from the lexicon: exact anagrams of a word (the same
+# letters in a different order) and every word that can be built from some of its letters (sub-anagrams).
+# Every word is filed under its signature, its letters in sorted order ('bird' -> 'bdir'), so exact anagrams are a
+# single lookup. Each signature is in turn filed under a bitmask of which letters it uses; a word can only be built
+# from the user's word if its mask is a subset of the user's mask, so only those signatures are checked letter by
+# letter. Like one_grams.sfx, it's tied to the lexicon's build ID and rebuilt when that changes.
+#
+# file layout (all numbers are 4-byte unsigned integers):
+#   magic (8 bytes) | number of words n | number of signatures s | number of masks m | lexicon build ID |
+#   m masks, in order | m+1 mask starts (into the signatures) | s+1 signature starts (into the word IDs) |
+#   n word IDs, ordered by mask and then signature
+ANAGRAM_INDEX_MAGIC = b'WPANA\x00\x00\x01'
+
+
+
+# builds one_grams.ana for the binary lexicon
+def build_anagram_index(lexicon_path='one_grams.lex', path='one_grams.ana'):
+    base = MappedLexicon(lexicon_path)
+
+    entries = sorted((letter_mask(word), ''.join(sorted(word)), word_id) for word_id, word in enumerate(base))
+
+    masks = array('I')
+    mask_starts = array('I')
+    signature_starts = array('I')
+    word_ids = array('I')
+    previous = None
+    for mask, signature, word_id in entries:
+        if previous is None or previous != (mask, signature):
+            if previous is None or previous[0] != mask:
+                masks.append(mask)
+                mask_starts.append(len(signature_starts))
+            signature_starts.append(len(word_ids))
+            previous = (mask, signature)
+        word_ids.append(word_id)
+    mask_starts.append(len(signature_starts))
+    signature_starts.append(len(word_ids))
+
+    with write_atomically(path) as outfile:
+        outfile.write(ANAGRAM_INDEX_MAGIC)
+        outfile.write(array('I', [len(word_ids), len(signature_starts) - 1, len(masks), base.build_id]).tobytes())
+        outfile.write(masks.tobytes())
+        outfile.write(mask_starts.tobytes())
+        outfile.write(signature_starts.tobytes())
+        outfile.write(word_ids.tobytes())
+
+
+
+# A read-only, memory-mapped view of one_grams.ana for the binary lexicon base (see MappedIndex)
+class AnagramIndex(MappedIndex):
+    magic = ANAGRAM_INDEX_MAGIC
+    description = 'an anagram index file'
+    header_size = 4
+
+    def __init__(self, base, path='one_grams.ana'):
+        super().__init__(base, path)
+
+        self.count, self.signature_count, mask_count, self.build_id = self.header
+        self.masks = self.next_table(mask_count)
+        self.mask_starts = self.next_table(mask_count + 1)
+        self.signature_starts = self.next_table(self.signature_count + 1)
+        self.word_ids = self.next_table(self.count)
+
+    # where a mask is in the list of masks, or None if no word has exactly those letters
+    def mask_position(self, mask):
+        import bisect
+
+        i = bisect.bisect_left(self.masks, mask)
+        if i == len(self.masks) or self.masks[i] != mask:
+            return None
+        return i
+
+    # the signatures filed under the i-th mask, as (signature, words)
+    def signatures(self, i):
+        found = []
+        for s in range(self.mask_starts[i], self.mask_starts[i + 1]):
+            words = [self.base[word_id] for word_id in
+                     self.word_ids[self.signature_starts[s]:self.signature_starts[s + 1]]]
+            found.append((''.join(sorted(words[0])), words))
+        return found
+
+    # words with exactly the same letters as word, not including word itself
+    def anagrams(self, word):
+        i = self.mask_position(letter_mask(word))
+        if i is None:
+            return []
+
+        signature = ''.join(sorted(word))
+        for other_signature, words in self.signatures(i):
+            if other_signature == signature:
+                return [other for other in words if other != word]
+        return []
+
+    # words (at least min_length letters long) that can be made from the letters of word, each letter used no more
+    # times than it appears in word; this includes the exact anagrams, but not word itself
+    def sub_anagrams(self, word, min_length=2):
+        mask = letter_mask(word)
+        letter_counts = Counter(word)
+
+        # the masks that use only the word's letters: when there are fewer of those than masks in the index, go
+        # through them directly (every subset of the word's letters), otherwise check every mask in the index
+        letters = [1 << i for i in range(27) if mask & (1 << i)]
+        if 2 ** len(letters) < len(self.masks):
+            masks = [sum(bits) for n in range(1, len(letters) + 1) for bits in itertools.combinations(letters, n)]
+            positions = [i for i in map(self.mask_position, masks) if i is not None]
+        else:
+            positions = [i for i, other in enumerate(self.masks) if other & ~mask == 0]
+
+        found = []
+        for i in positions:
+            for signature, words in self.signatures(i):
+                if min_length <= len(signature) <= len(word) and all(
+                        signature.count(letter) <= letter_counts[letter] for letter in set(signature)):
+                    found.extend(other for other in words if other != word)
+
+        return found
+
+
+
+# opens the anagram index for the lexicon (see open_lexicon_index)
+def open_anagram_index(lexicon, path='one_grams.ana'):
+    return open_lexicon_index(lexicon, AnagramIndex, build_anagram_index, path)
+
+
+
+# the anagrams and the sub-anagrams (see AnagramIndex) of user_word in the lexicon, as (anagrams, sub_anagrams)
+# words added since the binary lexicon was built aren't in the anagram index, so those are checked directly
+def find_anagrams(user_word, lexicon, anagram_index, min_length=2):
+    anagrams = anagram_index.anagrams(user_word)
+    sub_anagrams = anagram_index.sub_anagrams(user_word, min_length)
+    if len(lexicon.removed) > 0 or len(lexicon.blacklist) > 0:
+        anagrams = [word for word in anagrams if word not in lexicon.removed and word not in lexicon.blacklist]
+        sub_anagrams = [word for word in sub_anagrams
+                        if word not in lexicon.removed and word not in lexicon.blacklist]
+
+    signature = sorted(user_word)
+    letter_counts = Counter(user_word)
+    for word in lexicon.extra_words():
+        if word in lexicon.blacklist or word == user_word:
+            continue
+        if sorted(word) == signature:
+            anagrams.append(word)
+        if min_length <= len(word) <= len(user_word) and not Counter(word) - letter_counts:
+            sub_anagrams.append(word)
+
+    return anagrams, sub_anagrams
+
+
+
+# a bitmask of the letters in a word: bit 0 for 'a' up to bit 25 for 'z', and bit 26 for anything else
+def letter_mask(word):
+    mask = 0
+    for letter in word:
+        mask |= 1 << (ord(letter) - 97 if 'a' <= letter <= 'z' else 26)
+    return mask
+
+
+
+# sorts words by frequency (most common first), keeping just the top most common if asked to
+def rank_by_frequency(words, frequencies, top=None):
+    if top is not None and top < len(words):
+        return heapq.nlargest(top, words, key=frequencies.get)
+    return sorted(words, key=frequencies.get, reverse=True)
+
+
+
+# prints the anagrams and the words made from the letters of the user's word side by side
+def print_anagrams(user_word, anagrams, sub_anagrams, anagram_count=None, sub_anagram_count=None):
+    if anagram_count is None:
+        anagram_count = len(anagrams)
+    if sub_anagram_count is None:
+        sub_anagram_count = len(sub_anagrams)
+
+    print()
+    print()
+    print('Printing results BY FREQUENCY (most common first):')
+    print()
+    print('Anagrams of "' + user_word + '"')
+    print()
+
+    print('Anagrams (%-38s Made from its letters (%s' % (str(anagram_count) + ' results)', str(sub_anagram_count) + ' results)'))
+    print('---------------------------------------------------------------------------------------------------')
+
+    for i in range(max(len(anagrams), len(sub_anagrams))):
+        w1 = anagrams[i] if i < len(anagrams) else ''
+        w2 = sub_anagrams[i] if i < len(sub_anagrams) else ''
+        print('%-48s %s' % (w1, w2))
+
+
+
+# compares building the anagram index and answering queries with it against checking every word in the lexicon
+# this is only needed to check the speed of the anagram search; leaving it here for reference
+def benchmark_anagrams(seed_words=['bird', 'water', 'listen', 'triangle', 'education'], repeats=20):
+    lexicon = open_lexicon()
+    words = list(lexicon)
+
+    t0 = time.perf_counter()
+    build_anagram_index()
+    build_time = time.perf_counter() - t0
+    index = open_anagram_index(lexicon)
+
+    print('Index of %d words (%d signatures) built in %.3f s' % (len(words), index.signature_count, build_time))
+    print()
+    print('%-12s %9s %14s %14s %14s' % ('word', 'results', 'anagrams', 'sub-anagrams', 'full scan'))
+
+    report = {'build_seconds': build_time, 'queries': []}
+    for word in seed_words:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            index.anagrams(word)
+        anagram_time = (time.perf_counter() - t0) / repeats
+
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            found = find_anagrams(word, lexicon, index)[1]
+        sub_anagram_time = (time.perf_counter() - t0) / repeats
+
+        # the original approach: count the letters of every word in the lexicon
+        t0 = time.perf_counter()
+        letter_counts = Counter(word)
+        scanned = [other for other in words if 2 <= len(other) <= len(word) and other != word and
+                   not Counter(other) - letter_counts]
+        scan_time = time.perf_counter() - t0
+
+        assert sorted(found) == sorted(scanned)
+
+        report['queries'].append({'word': word, 'results': len(found), 'anagram_ms': anagram_time * 1000,
+                                  'sub_anagram_ms': sub_anagram_time * 1000, 'scan_ms': scan_time * 1000})
+        print('%-12s %9d %11.3f ms %11.3f ms %11.1f ms' % (word, len(found), anagram_time * 1000,
+                                                         sub_anagram_time * 1000, scan_time * 1000))
+
+    return report
+
+
+
+# The pattern index, one_grams.pat, answers crossword-style patterns, where '?' stands for any one letter and '*'
+# for any number of letters (including none): 'c?t' matches cat and cot, '??ing' matches thing, and 'a*ion' matches
+# action. The words of the binary lexicon are split up by length, and for each length there's a bitset for every
+# letter at every position: bit i of the bitset for 'c' at position 0 of the five-letter words is set if the i-th
+# five-letter word starts with 'c'. A pattern is answered by ANDing together the bitsets of the letters it fixes in
+# place, so the words are never checked one at a time.
+# For a pattern with a '*', the letters before the first '*' are fixed from the start of the word and the letters
+# after the last '*' are fixed from the end, for every word length the pattern could match; anything between two
+# '*'s is checked on the words that are left.
+# Like one_grams.sfx, it's tied to the lexicon's build ID and rebuilt when that changes, so a query only reads the
+# handful of bitsets it needs out of the mapped file instead of building them all every time.
+#
+# file layout (numbers are 4-byte unsigned integers, unless they're keys):
+#   magic (8 bytes) | number of words n | number of lengths m | number of bitsets k | lexicon build ID |
+#   k keys (8 bytes each: length << 48 | position << 32 | letter) | k bitset offsets | m lengths |
+#   m+1 group starts | n word IDs, grouped by length | bitsets (each as long as its length group, in bits)
+PATTERN_INDEX_MAGIC = b'WPPAT\x00\x00\x01'
+
+
+
+# builds one_grams.pat for the binary lexicon
+def build_pattern_index(lexicon_path='one_grams.lex', path='one_grams.pat'):
+    base = MappedLexicon(lexicon_path)
+
+    # the word IDs of each length, and the positions of the words in those groups for each (length, position, letter)
+    groups = {}
+    positions = {}
+    for word_id, word in enumerate(base):
+        group = groups.setdefault(len(word), [])
+        for position, letter in enumerate(word):
+            positions.setdefault(len(word) << 48 | position << 32 | ord(letter), []).append(len(group))
+        group.append(word_id)
+
+    lengths = sorted(groups)
+    starts = array('I', [0])
+    word_ids = array('I')
+    for length in lengths:
+        word_ids.extend(groups[length])
+        starts.append(len(word_ids))
+
+    keys = sorted(positions)
+    offsets = array('I')
+    bitsets = []
+    total = 0
+    for key in keys:
+        size = (len(groups[key >> 48]) + 7) // 8
+        bitsets.append(bits_from_positions(positions[key]).to_bytes(size, 'little'))
+        offsets.append(total)
+        total += size
+
+    with write_atomically(path) as outfile:
+        outfile.write(PATTERN_INDEX_MAGIC)
+        outfile.write(array('I', [len(word_ids), len(lengths), len(keys), base.build_id]).tobytes())
+        outfile.write(array('Q', keys).tobytes())
+        outfile.write(offsets.tobytes())
+        outfile.write(array('I', lengths).tobytes())
+        outfile.write(starts.tobytes())
+        outfile.write(word_ids.tobytes())
+        outfile.write(b''.join(bitsets))
+
+
+
+# A read-only, memory-mapped view of one_grams.pat for the binary lexicon base (see MappedIndex)
+class PatternIndex(MappedIndex):
+    magic = PATTERN_INDEX_MAGIC
+    description = 'a pattern index file'
+    header_size = 4
+
+    def __init__(self, base, path='one_grams.pat'):
+        super().__init__(base, path)
+
+        self.count, length_count, key_count, self.build_id = self.header
+        self.keys = self.next_table(key_count, 'Q')
+        self.offsets = self.next_table(key_count)
+        self.lengths = self.next_table(length_count)
+        self.starts = self.next_table(length_count + 1)
+        self.word_ids = self.next_table(self.count)
+        self.bits_start = self.table_start
+
+        # where each length's group is in the list of lengths, e.g. {1: 0, 2: 1, ...}
+        self.groups = {length: i for i, length in enumerate(self.lengths)}
+
+    # the word IDs of every word with the given length
+    def group(self, length):
+        i = self.groups[length]
+        return self.word_ids[self.starts[i]:self.starts[i + 1]]
+
+    # the bitset of the words of the given length with the letter at the position
+    def bits(self, length, position, letter):
+        import bisect
+
+        key = length << 48 | position << 32 | ord(letter)
+        i = bisect.bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return 0
+
+        start = self.bits_start + self.offsets[i]
+        return int.from_bytes(self.map[start:start + (len(self.group(length)) + 7) // 8], 'little')
+
+    # returns every word of the binary lexicon matching the pattern
+    def matches(self, pattern):
+        if '*' not in pattern:
+            head, middle, tail = pattern, None, ''
+            lengths = [len(pattern)] if len(pattern) in self.groups else []
+        else:
+            head, tail = pattern[:pattern.index('*')], pattern[pattern.rindex('*') + 1:]
+            middle = pattern[len(head):len(pattern) - len(tail)]
+            shortest = len(pattern) - pattern.count('*')
+            lengths = [length for length in self.lengths if length >= shortest]
+
+        found = []
+        for length in lengths:
+            group = self.group(length)
+
+            # start with every word of this length, and keep the ones with the right letter in each fixed position
+            everything = (1 << len(group)) - 1
+            bits = everything
+            fixed = [(position, letter) for position, letter in enumerate(head)]
+            fixed += [(length - len(tail) + position, letter) for position, letter in enumerate(tail)]
+            for position, letter in fixed:
+                if letter != '?':
+                    bits &= self.bits(length, position, letter)
+                    if bits == 0:
+                        break
+
+            word_ids = group if bits == everything else [group[i] for i in positions_from_bits(bits)]
+            words = [self.base.word_bytes(word_id).decode('utf-8') for word_id in word_ids]
+
+            # a pattern with more than one '*' still needs the letters between them checked
+            if middle is not None and middle != '*':
+                words = [word for word in words if fnmatch.fnmatchcase(word, pattern)]
+
+            found.extend(words)
+
+        return found
+
+
+
+# opens the pattern index for the lexicon (see open_lexicon_index)
+def open_pattern_index(lexicon, path='one_grams.pat'):
+    return open_lexicon_index(lexicon, PatternIndex, build_pattern_index, path)
+
+
+
+# every word of the lexicon matching the pattern
+# words added since the binary lexicon was built aren't in the pattern index, so those are checked directly
+def find_pattern_matches(pattern, lexicon, pattern_index):
+    found = pattern_index.matches(pattern)
+    if len(lexicon.removed) > 0 or len(lexicon.blacklist) > 0:
+        found = [word for word in found if word not in lexicon.removed and word not in lexicon.blacklist]
+
+    found.extend(word for word in lexicon.extra_words()
+                 if word not in lexicon.blacklist and fnmatch.fnmatchcase(word, pattern))
+
+    return found
+
+
+
+# turns a list of positions into a bitset (an int with those bits set)
+def bits_from_positions(positions):
+    bitmap = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+
+# turns a bitset back into the list of positions of its set bits
+def positions_from_bits(bits):
+    positions = []
+    while bits:
+        lowest = bits & -bits
+        positions.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return positions
+
+
+
+# whether a word can be used as a pattern (it has a '?' or '*' in it)
+def is_pattern(word):
+    return '?' in word or '*' in word
+
+
+
+# keeps just the results (from search_word) that match a pattern; two-grams are matched without their space
+# there are only ever a few thousand results, so they're simply checked one at a time
+def filter_by_pattern(results, pattern):
+    return [word for word in results if fnmatch.fnmatchcase(word.replace(' ', ''), pattern)]
+
+
+
+# prints the words matching a pattern, one per line with its frequency
+def print_matches(pattern, words, counts, order='frequency', total=None):
+    if total is None:
+        total = len(words)
+
+    print()
+    print()
+    if order == 'frequency':
+        print('Printing results BY FREQUENCY (most common first):')
+    else:
+        print('Printing results ALPHABETICALLY:')
+    print()
+    print('Words matching "%s" (%d results)' % (pattern, total))
+    print('---------------------------------------------------------------------------------------------------')
+
+    for word in words:
+        print('%-60s %d' % (word, counts[word]))
+
+
+
+# compares building the pattern index and answering patterns with it against testing every word with a regex
+# this is only needed to check the speed of the pattern search; leaving it here for reference
+def benchmark_patterns(patterns=['c?t', '??ing', 'a*ion', '?a?e?', 'un*able', 's*s*s'], repeats=50):
+    lexicon = open_lexicon()
+    words = list(lexicon)
+
+    t0 = time.perf_counter()
+    build_pattern_index()
+    build_time = time.perf_counter() - t0
+    index = open_pattern_index(lexicon)
+
+    print('Index of %d words built in %.3f s' % (len(words), build_time))
+    print()
+    print('%-12s %9s %14s %14s' % ('pattern', 'results', 'index', 'regex scan'))
+
+    report = {'build_seconds': build_time, 'queries': []}
+    for pattern in patterns:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            found = find_pattern_matches(pattern, lexicon, index)
+        index_time = (time.perf_counter() - t0) / repeats
+
+        t0 = time.perf_counter()
+        regex = re.compile(fnmatch.translate(pattern))
+        scanned = [word for word in words if regex.match(word)]
+        scan_time = time.perf_counter() - t0
+
+        assert sorted(found) == sorted(scanned)
+
+        report['queries'].append({'pattern': pattern, 'results': len(found), 'index_ms': index_time * 1000,
+                                  'scan_ms': scan_time * 1000})
+        print('%-12s %9d %11.3f ms %11.2f ms' % (pattern, len(found), index_time * 1000, scan_time * 1000))
+
+    return report
+
+
+
+# The suffix array, one_grams.sfx, finds every word with a given piece anywhere inside it, e.g. 'bird' in
+# 'blackbirds'. It lists every suffix of every word in the binary lexicon ('blackbirds', 'lackbirds', ..., 's') in
+# sorted order, so all the suffixes that start with the piece sit next to each other and can be found with a binary
+# search; each one is an occurrence of the piece, so the time taken grows with the number of matches, not with the
+# size of the lexicon. The suffixes aren't stored themselves, just where each one starts in the lexicon's word bytes
+# and which word it belongs to. Like word_freqs.bin, it's tied to the lexicon's build ID and rebuilt when that changes.
+#
+# file layout: magic (8 bytes) | number of suffixes n (4 bytes) | lexicon build ID (4 bytes) |
+#              n suffix positions (4 bytes each) | n word IDs (4 bytes each)
+SUFFIX_ARRAY_MAGIC = b'WPSFX\x00\x00\x01'
+
+
+
+# builds one_grams.sfx for the binary lexicon
+def build_suffix_array(lexicon_path='one_grams.lex', path='one_grams.sfx'):
+    base = MappedLexicon(lexicon_path)
+
+    # every suffix of every word, as bytes, along with where it starts and which word it's from
+    suffixes = []
+    positions = array('I')
+    word_ids = array('I')
+    for word_id in range(len(base)):
+        word = base.word_bytes(word_id)
+        start = base.offsets[word_id]
+        for i in range(len(word)):
+            suffixes.append(word[i:])
+            positions.append(start + i)
+            word_ids.append(word_id)
+
+    order = sorted(range(len(suffixes)), key=suffixes.__getitem__)
+
+    with write_atomically(path) as outfile:
+        outfile.write(SUFFIX_ARRAY_MAGIC)
+        outfile.write(array('I', [len(order), base.build_id]).tobytes())
+        outfile.write(array('I', (positions[i] for i in order)).tobytes())
+        outfile.write(array('I', (word_ids[i] for i in order)).tobytes())
+
+
+
+# A read-only, memory-mapped view of one_grams.sfx for the binary lexicon base (see MappedIndex)
+class SuffixArray(MappedIndex):
+    magic = SUFFIX_ARRAY_MAGIC
+    description = 'a suffix array file'
+
+    def __init__(self, base, path='one_grams.sfx'):
+        super().__init__(base, path)
+
+        self.count, self.build_id = self.header
+        self.positions = self.next_table(self.count)
+        self.word_ids = self.next_table(self.count)
+
+    # the bytes of the i-th suffix in sorted order
+    def suffix_bytes(self, i):
+        start = self.base.data_start
+        return self.base.map[start + self.positions[i]:start + self.base.offsets[self.word_ids[i] + 1]]
+
+    # position of the first suffix that isn't less than key (as bytes)
+    def lower_bound(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.suffix_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # every place the piece appears inside a word, as (word, position of the piece in the word)
+    def occurrences(self, piece):
+        key = piece.encode('utf-8')
+        word_bytes, offsets = self.base.word_bytes, self.base.offsets
+
+        found = []
+        for i in range(self.lower_bound(key), self.lower_bound(key + b'\xff')):
+            word_id = self.word_ids[i]
+            word = word_bytes(word_id)
+            position = self.positions[i] - offsets[word_id]
+
+            # positions are counted in bytes; count them in letters instead if the word has any non-ASCII letters
+            if not word.isascii():
+                position = len(word[:position].decode('utf-8'))
+            found.append((word.decode('utf-8'), position))
+
+        return found
+
+
+
+# opens the suffix array for the lexicon (see open_lexicon_index)
+def open_suffix_array(lexicon, path='one_grams.sfx'):
+    return open_lexicon_index(lexicon, SuffixArray, build_suffix_array, path)
+
+
+
+# every place user_word appears inside a word of the lexicon, as (word, position of user_word in the word)
+# words added since the binary lexicon was built aren't in the suffix array, so those are checked directly
+def find_occurrences(user_word, lexicon, suffix_array):
+    found = suffix_array.occurrences(user_word)
+    if len(lexicon.removed) > 0 or len(lexicon.blacklist) > 0:
+        found = [(word, position) for word, position in found
+                 if word not in lexicon.removed and word not in lexicon.blacklist]
+
+    for word in lexicon.extra_words():
+        if word in lexicon.blacklist:
+            continue
+        position = word.find(user_word)
+        while position != -1:
+            found.append((word, position))
+            position = word.find(user_word, position + 1)
+
+    return found
+
+
+
+# every word containing user_word anywhere (including the beginning or end), not including user_word itself
+def find_containing(user_word, lexicon, suffix_array):
+    return list(dict.fromkeys(word for word, position in find_occurrences(user_word, lexicon, suffix_array)
+                              if word != user_word))
+
+
+
+# one-grams with user_word in the middle, where the pieces on both sides of it are also valid words
+def find_middle(user_word, lexicon, suffix_array):
+    # the same pieces come up again and again (like the 'g' after 'in' in every '-ing' word), so remember the
+    # answer for each one instead of searching the lexicon every time
+    valid = {}
+
+    def is_valid(piece):
+        if piece not in valid:
+            valid[piece] = piece in lexicon
+        return valid[piece]
+
+    found = []
+    for word, position in find_occurrences(user_word, lexicon, suffix_array):
+        left, right = word[:position], word[position + len(user_word):]
+        if len(left) > 0 and len(right) > 0 and is_valid(right) and is_valid(left):
+            found.append(word)
+
+    return list(dict.fromkeys(found))
+
+
+
+# compares finding the words containing a piece with the suffix array against checking every word in the lexicon
+# this is only needed to check the speed of the search; leaving it here for reference
+def benchmark_infix(seed_words=['in', 'bird', 'water', 'light', 'house'], repeats=20):
+    lexicon = open_lexicon()
+    words = list(lexicon)
+
+    t0 = time.perf_counter()
+    build_suffix_array()
+    build_time = time.perf_counter() - t0
+    suffix_array = open_suffix_array(lexicon)
+
+    print('Suffix array of %d suffixes built in %.2f s' % (suffix_array.count, build_time))
+    print()
+    print('%-12s %9s %14s %14s %9s %14s' % ('word', 'contain', 'suffix array', 'full scan', 'middle', 'middle time'))
+
+    report = {'build_seconds': build_time, 'queries': []}
+    for word in seed_words:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            found = find_containing(word, lexicon, suffix_array)
+        array_time = (time.perf_counter() - t0) / repeats
+
+        t0 = time.perf_counter()
+        scanned = [other for other in words if word in other and other != word]
+        scan_time = time.perf_counter() - t0
+
+        assert sorted(found) == sorted(scanned)
+
+        t0 = time.perf_counter()
+        middle = find_middle(word, lexicon, suffix_array)
+        middle_time = time.perf_counter() - t0
+
+        report['queries'].append({'word': word, 'containing': len(found), 'suffix_array_ms': array_time * 1000,
+                                  'scan_ms': scan_time * 1000, 'middle': len(middle), 'middle_ms': middle_time * 1000})
+        print('%-12s %9d %11.3f ms %11.2f ms %9d %11.2f ms' % (word, len(found), array_time * 1000, scan_time * 1000,
+                                                              len(middle), middle_time * 1000))
+
+    return report
+
+
+
+# The spelling index, one_grams.del, suggests corrections for words that aren't in the lexicon, like "brid" ->
+# "bird", using the symmetric delete method: two words are within two edits of each other only if deleting at most
+# two letters from each can make them the same. So every word is filed under each of the ways of deleting up to two
+# of its letters ('bird' -> 'bird', 'ird', 'brd', ..., 'bd', 'br'), and a misspelled word is looked up under each of
+# its own deletions; only the handful of words found that way are checked properly. To keep the index small, only
+# the first prefix_length letters of each word are used; the full words are still compared at the end.
+# Rather than the deletions themselves, a checksum of each one is stored, sorted, next to the ID of its word, and
+# the file is memory-mapped like the lexicon. Like word_freqs.bin, it's tied to the lexicon's build ID.
+#
+# file layout: magic (8 bytes) | number of entries n (4 bytes) | lexicon build ID (4 bytes) |
+#              n checksums (4 bytes each, sorted) | n word IDs (4 bytes each)
+SPELLING_MAGIC = b'WPDEL\x00\x00\x01'
+SPELLING_MAX_DISTANCE = 2
+SPELLING_PREFIX_LENGTH = 7
+
+# words shorter than this only get corrections one edit away; a short word two edits away from another is more often
+# a different word altogether ('selfie' and 'smeltie') than a typo
+SPELLING_LONG_WORD = 8
+
+
+
+# every way of deleting up to max_distance letters from a word, including the word itself
+def deletes(word, max_distance=SPELLING_MAX_DISTANCE):
+    found = {word}
+    current = {word}
+    for distance in range(max_distance):
+        current = {piece[:i] + piece[i + 1:] for piece in current for i in range(len(piece))}
+        found |= current
+    return found
+
+
+
+# the number of single-letter insertions, deletions, substitutions and swaps of neighbouring letters it takes to turn
+# one word into the other; stops early and returns limit + 1 once it's clear the answer is more than limit
+def edit_distance(a, b, limit=SPELLING_MAX_DISTANCE):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # letters the words start or end with in common don't change the answer, and skipping them leaves most
+    # candidates with only two or three letters to compare
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1]
+
+
+
+# builds one_grams.del for the binary lexicon
+def build_spelling_index(lexicon_path='one_grams.lex', path='one_grams.del'):
+    base = MappedLexicon(lexicon_path)
+
+    # one entry per (deletion, word), packed into a single number so they sort by checksum
+    entries = []
+    for word_id, word in enumerate(base):
+        for piece in deletes(word[:SPELLING_PREFIX_LENGTH]):
+            entries.append(zlib.crc32(piece.encode('utf-8')) << 32 | word_id)
+    entries.sort()
+
+    with write_atomically(path) as outfile:
+        outfile.write(SPELLING_MAGIC)
+        outfile.write(array('I', [len(entries), base.build_id]).tobytes())
+        outfile.write(array('I', (entry >> 32 for entry in entries)).tobytes())
+        outfile.write(array('I', (entry & 0xffffffff for entry in entries)).tobytes())
+
+
+
+# A read-only, memory-mapped view of one_grams.del for the binary lexicon base (see MappedIndex)
+class SpellingIndex(MappedIndex):
+    magic = SPELLING_MAGIC
+    description = 'a spelling index file'
+
+    def __init__(self, base, path='one_grams.del'):
+        super().__init__(base, path)
+
+        self.count, self.build_id = self.header
+        self.checksums = self.next_table(self.count)
+        self.word_ids = self.next_table(self.count)
+
+    # the IDs of every word filed under any of the given deletions
+    def candidates(self, pieces):
+        import bisect
+
+        found = set()
+        for piece in pieces:
+            checksum = zlib.crc32(piece.encode('utf-8'))
+            start = bisect.bisect_left(self.checksums, checksum)
+            end = bisect.bisect_right(self.checksums, checksum, start)
+            found.update(self.word_ids[start:end])
+        return found
+
+
+
+# opens the spelling index for the lexicon (see open_lexicon_index)
+def open_spelling_index(lexicon, path='one_grams.del'):
+    return open_lexicon_index(lexicon, SpellingIndex, build_spelling_index, path)
+
+
+
+# Suggests corrections for a word that isn't in the lexicon: the words the fewest edits away from it (see
+# edit_distance), up to max_distance, most common first. Returns a list of (word, distance) tuples, at most top long.
+# Words one edit away are looked for first, and words two edits away only if there aren't any, and only for words
+# at least SPELLING_LONG_WORD letters long (unless max_distance is given).
+# Words added since the binary lexicon was built aren't in the spelling index, so those are checked directly.
+def suggest_corrections(user_word, lexicon, spelling_index, frequencies, max_distance=None, top=5):
+    if max_distance is None:
+        max_distance = SPELLING_MAX_DISTANCE if len(user_word) >= SPELLING_LONG_WORD else 1
+
+    base = spelling_index.base
+    offsets = base.offsets
+    length = len(user_word.encode('utf-8'))
+    found = {}
+
+    for distance in range(1, max_distance + 1):
+        # words whose lengths are too far off can't be close enough, and are skipped before they're even read
+        word_ids = spelling_index.candidates(deletes(user_word[:SPELLING_PREFIX_LENGTH], distance))
+        candidates = [base.word_bytes(word_id).decode('utf-8') for word_id in word_ids
+                      if abs(offsets[word_id + 1] - offsets[word_id] - length) <= distance]
+
+        for word in candidates + lexicon.extra_words():
+            if word == user_word or word in lexicon.removed or word in lexicon.blacklist:
+                continue
+            if edit_distance(user_word, word, distance) <= distance:
+                found[word] = distance
+
+        if found:
+            break
+
+    return heapq.nlargest(top, found.items(), key=lambda item: frequencies.get(item[0]))
+
+
+
+# The "did you mean" list for a word that came back invalid: if it isn't in the lexicon either, the words it was
+# most likely a typo of (see suggest_corrections); otherwise an empty list.
+# This only runs once a word has been looked up (or the suggestion cache or two-gram store already knew it was
+# invalid), since plenty of real words aren't in the lexicon yet, like 'email', and are only one edit from one that is.
+def did_you_mean(user_word, lexicon, frequencies, spelling_index=None, top=5):
+    if user_word in lexicon:
+        return []
+
+    with span('spelling'):
+        if spelling_index is None:
+            spelling_index = open_spelling_index(lexicon)
+        return [word for word, distance in suggest_corrections(user_word, lexicon, spelling_index, frequencies,
+                                                               top=top)]
+
+
+
+# prints the corrections from did_you_mean
+def print_corrections(user_word, corrections):
+    print('\n"%s" isn\'t in the word list. Did you mean:' % user_word)
+    for word in corrections:
+        print('    %s' % word)
+
+
+
+# compares suggesting corrections with the spelling index against checking the edit distance to every word
+# this is only needed to check the speed of the spelling suggestions; leaving it here for reference
+def benchmark_spelling(misspellings=['brid', 'watr', 'ligth', 'hosue', 'establishmnet', 'xylophne'], repeats=20):
+    lexicon, frequencies, compound_index = load_data()
+    words = list(lexicon)
+
+    t0 = time.perf_counter()
+    build_spelling_index()
+    build_time = time.perf_counter() - t0
+    spelling_index = open_spelling_index(lexicon)
+
+    print('Spelling index of %d entries built in %.2f s' % (spelling_index.count, build_time))
+    print()
+    print('%-16s %-32s %12s %12s' % ('misspelling', 'suggestions', 'index', 'full scan'))
+
+    report = {'build_seconds': build_time, 'queries': []}
+    for misspelling in misspellings:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            corrections = suggest_corrections(misspelling, lexicon, spelling_index, frequencies)
+        index_time = (time.perf_counter() - t0) / repeats
+
+        t0 = time.perf_counter()
+        scanned = [word for word in words if word != misspelling and edit_distance(misspelling, word) <= 2]
+        scan_time = time.perf_counter() - t0
+
+        report['queries'].append({'word': misspelling, 'suggestions': [word for word, distance in corrections],
+                                  'within_distance': len(scanned), 'index_ms': index_time * 1000,
+                                  'scan_ms': scan_time * 1000})
+        print('%-16s %-32s %9.3f ms %9.1f ms' % (misspelling, ', '.join(word for word, distance in corrections[:3]),
+                                                index_time * 1000, scan_time * 1000))
+
+    return report
+
+
+
+# where the suggestion pages are downloaded from; '/s/<word>' lists suggestions starting with the word and
+# '/e/<word>' lists suggestions ending with it
+# to test without a network connection, point this at a local server of recorded pages (see serve_recorded_pages)
+DICTIONARY_URL = 'https://www.thefreedictionary.com'
+
+
+
+# spaces out requests to the same website so we never hit it more than requests_per_second times a second,
+# no matter how many threads are fetching at once
+class HostRateLimiter:
+    def __init__(self, requests_per_second=5):
+        self.interval = 1 / requests_per_second
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    # blocks until we're allowed to send another request to this host
+    def wait(self, host):
+        # reserve the next open time slot for this host while holding the lock, then sleep outside of it
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+
+# creates a requests session that keeps connections open between requests and retries failed requests
+# pool_size should be at least the number of threads that will share the session
+def make_session(retries=3, backoff=0.5, pool_size=10):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+
+# Reads the suggestions off of a suggestion page in a single pass, as the page is downloaded
+# chunks is any iterable of pieces of the page's HTML (e.g. a streamed web response, or [text] for a whole page)
+# Each suggestion is cleaned as it's found and yielded as a list of words: suggestions containing punctuation and
+# suggestions longer than two words are skipped, since we can never use them
+# Results are returned in several consecutive ul elements with the suggestions tag, so once a different ul element
+# opens after them, there's nothing left to find and we stop reading the page
+# raises an IndexError if the page has no suggestions, which means the word was not found on the free dictionary
+def parse_suggestions(chunks):
+    # the only pieces of HTML we care about: opening and closing ul tags, and the text of each link
+    tokens = re.compile(r'(<ul[^>]*>)|(</ul>)|">(.*?)</a>')
+
+    found = False      # have we reached the first list of suggestions?
+    inside = False     # are we inside a list of suggestions right now?
+    between = []       # links found between two lists; they only count if another list of suggestions follows
+
+    buffer = ''
+    for chunk in itertools.chain(chunks, [None]):
+        # only look at the page up to the end of the last complete line or link, so a link is never cut in half;
+        # the rest waits for the next chunk (or is used as-is at the end of the page)
+        if chunk is None:
+            text, buffer = buffer, ''
+        else:
+            buffer += chunk
+            cut = max(buffer.rfind('\n') + 1, buffer.rfind('</a>') + 4 if '</a>' in buffer else 0)
+            text, buffer = buffer[:cut], buffer[cut:]
+
+        # skip straight past everything before the opening tag of the first list of suggestions
+        start = 0
+        if not found:
+            start = text.find('class=suggestions')
+            if start == -1:
+                continue
+            start = text.rfind('<ul', 0, start)
+
+        for match in tokens.finditer(text, start):
+            ul_open, ul_close, result = match.groups()
+
+            if ul_open is not None:
+                if 'class=suggestions' in ul_open:
+                    found = True
+                    inside = True
+                    # the links between the last list and this one are part of the results after all
+                    for words in between:
+                        yield words
+                    between = []
+                elif not inside:
+                    # a different list after the suggestions, so we've seen all of them
+                    return
+
+            elif ul_close is not None:
+                inside = False
+
+            else:
+                # set everything to lowercase, filter out any of the irrelevant results that contain certain
+                # punctuation, then split on spaces to get a list of words, and only keep one-grams and two-grams
+                result = result.lower()
+                if '-' not in result and '(' not in result and ',' not in result:
+                    words = result.split(' ')
+                    if len(words) <= 2:
+                        if inside:
+                            yield words
+                        else:
+                            between.append(words)
+
+    if not found:
+        raise IndexError('no suggestions found on the page')
+
+
+
+# after the suggestions, the rest of a page is read (as long as there's no more than this many bytes of it left),
+# so its connection goes back to the session for the next request; hanging up partway through a page closes the
+# connection, and the next request has to open a new one
+DRAIN_LIMIT = 256 * 1024
+
+
+
+# downloads a single suggestion page and returns its suggestions (see parse_suggestions), or None if the word was
+# not found on the free dictionary; mode is 's' for words starting with the word or 'e' for words ending with it
+# the page is streamed, so the suggestions are read as it downloads
+# an error response (e.g. 403 or 404) raises an HTTPError rather than returning None, so it's never cached or saved
+# as an invalid word
+def fetch_suggestions(session, mode, word, timeout=10, rate_limiter=None):
+    URL = DICTIONARY_URL + '/' + mode + '/' + word
+
+    if rate_limiter is not None:
+        rate_limiter.wait(urlparse(URL).netloc)
+
+    with session.get(URL, timeout=timeout, stream=True) as page:
+        page.raise_for_status()
+
+        # make sure the streamed chunks are decoded to text, even if the website doesn't tell us the encoding
+        if page.encoding is None:
+            page.encoding = 'utf-8'
+
+        try:
+            suggestions = list(parse_suggestions(page.iter_content(chunk_size=8192, decode_unicode=True)))
+        except IndexError:
+            suggestions = None
+        finally:
+            count_event('pages_fetched')
+
+        drained = 0
+        while drained <= DRAIN_LIMIT:
+            chunk = page.raw.read(65536, decode_content=True)
+            if not chunk:
+                break
+            drained += len(chunk)
+
+        count_event('bytes_fetched', page.raw.tell())
+        return suggestions
+
+
+
+# downloads the suggestions for any number of words at the same time
+# every (mode, word) pair is fetched on a pool of at most max_workers threads sharing one keep-alive session,
+# and the website is never sent more than requests_per_second requests a second
+# returns a dictionary in the format {(mode, word): suggestions}, where the suggestions are None for a word the
+# free dictionary didn't recognize
+# a session and rate_limiter can be passed in to share them between calls (the query server does this), so the
+# connections stay open from one call to the next and the rate limit holds across all of them
+# a page that can't be downloaded (no connection, or an error response) raises a requests.RequestException; if an
+# errors dictionary is passed in, the words whose pages failed are left out instead, and put in errors in the format
+# {word: error message}, so one bad word doesn't lose the rest
+def fetch_all_suggestions(words, modes=('s', 'e'), max_workers=8, timeout=10, retries=3, requests_per_second=5,
+                          session=None, rate_limiter=None, errors=None):
+    import requests
+
+    if session is None:
+        session = make_session(retries=retries, pool_size=max_workers)
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(requests_per_second)
+
+    # every combination of mode and word we need a page for
+    jobs = [(mode, word) for word in words for mode in modes]
+
+    def fetch(job):
+        try:
+            return fetch_suggestions(session, job[0], job[1], timeout, rate_limiter)
+        except requests.RequestException as error:
+            if errors is None:
+                raise
+            return error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        suggestions = dict(zip(jobs, pool.map(fetch, jobs)))
+
+    # a word is only any use with all of its pages
+    if errors is not None:
+        for (mode, word), result in list(suggestions.items()):
+            if isinstance(result, requests.RequestException):
+                errors.setdefault(word, str(result))
+        suggestions = {(mode, word): result for (mode, word), result in suggestions.items() if word not in errors}
+
+    return suggestions
+
+
+
+# starts a local web server in the background that stands in for the free dictionary, serving saved copies
+# of the suggestion pages from the fixtures folder (fixtures/s/<word>.html and fixtures/e/<word>.html)
+# delay adds a pause before each response, to imitate the time a real request takes over the internet
+# words without a saved page get an empty page back, the same as an invalid word on the real website
+def serve_recorded_pages(directory='fixtures', port=8000, delay=0.0):
+    import http.server
+
+    class RecordedPageHandler(http.server.BaseHTTPRequestHandler):
+        # keep connections open between requests, like the real website does
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+
+            # '/s/bird' -> 'fixtures/s/bird.html'
+            filename = os.path.join(directory, self.path.strip('/') + '.html')
+            if os.path.exists(filename):
+                with open(filename, 'rb') as infile:
+                    body = infile.read()
+            else:
+                body = b'<html><body></body></html>'
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # the scraper hangs up partway through very long pages (see DRAIN_LIMIT), which is expected, so don't report it
+        def handle(self):
+            try:
+                super().handle()
+            except (ConnectionResetError, BrokenPipeError):
+                pass
+
+        # don't print a line to the console for every request
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('localhost', port), RecordedPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+
+# compares fetching pages one at a time over fresh connections (the original approach) against fetching them
+# all at once over a shared session, using the local stand-in server so no internet connection is needed
+# this is only needed to check the speed of the downloads; leaving it here for reference
+def benchmark_fetching(seed_words=['bird', 'water', 'light', 'house', 'fire'], delay=0.05, port=8000):
+    global DICTIONARY_URL
+    import requests
+
+    # point the fetching functions at the local server for the length of the benchmark
+    server = serve_recorded_pages(port=port, delay=delay)
+    original_url = DICTIONARY_URL
+    DICTIONARY_URL = 'http://localhost:%d' % port
+
+    try:
+        # original approach: one request at a time, each one opening a brand new connection
+        t0 = time.perf_counter()
+        for word in seed_words:
+            for mode in ['s', 'e']:
+                try:
+                    extract_suggestions(requests.get(DICTIONARY_URL + '/' + mode + '/' + word).text)
+                except IndexError:
+                    pass
+        sequential = time.perf_counter() - t0
+
+        # new approach: all requests at once over a shared session
+        t0 = time.perf_counter()
+        fetch_all_suggestions(seed_words, requests_per_second=100)
+        concurrent = time.perf_counter() - t0
+
+    finally:
+        DICTIONARY_URL = original_url
+        server.shutdown()
+
+    print('Fetched %d pages one at a time in %.3f seconds' % (2 * len(seed_words), sequential))
+    print('Fetched %d pages concurrently in %.3f seconds' % (2 * len(seed_words), concurrent))
+
+
+
+# The original way of pulling the list of suggestions out of the HTML of a suggestion page, which searches the whole
+# page several times over; parse_suggestions replaced it, but leaving it here for reference and for the
+# parse_pages_original stage of benchmark_suite
+# raises an IndexError if the page has no suggestions, which means the word was not found on the free dictionary
+def extract_suggestions(text):
+    # "class=suggestions" within the ul html elements is indicative solely of the dictionary results
+    # find the first instance of this (aka the beginning of the results)
+    start_index = [m.start() for m in re.finditer('class=suggestions', text)][0]
+
+    # results are returned in several consecutive ul elements with the suggestions tag; find the last ul element of this type
+    last = [m.start() for m in re.finditer('class=suggestions', text)][-1]
+
+    # next, find all locations with the ul closing tag (not all of these will correspond to a suggestion ul)
+    ends = [m.start() for m in re.finditer('</ul>', text)]
+
+    # find the location of the first ul closing tag that is after the last suggestion tag
+    # this will indicate the ending location of the suggestions
+    # do this by looping through locations of all ul closing tags
+    end_index = len(text)
+    for i in ends:
+        # find the first one after the last suggestions tag and then break out of the loop
+        if i > last:
+            end_index = i
+            break
+
+    # within this subset of the text that we just found above, extract everything that falls between
+    # the end of one tag and a closign anchor tag
+    # this will give us a list of all of the suggestions from the webpage
+    results = re.findall(r'">.*?</a>', text[start_index:end_index])
+
+    # remove first two characters adn last four characters from each result (the html pieces that we used to find them)
+    # also set all characters to lowercase
+    return [result[2:-4].lower() for result in results]
+
+
+
+# Keeps the suggestions we've scraped from the free dictionary in the file suggestion_cache.db, so a word we've
+# looked up recently never has to be downloaded again. Entries are keyed by mode ('s' or 'e') and word.
+# Words with no suggestions (i.e., invalid words) are cached too, so typos don't cost a trip to the website either.
+# Entries older than ttl seconds (negative_ttl for invalid words) are ignored, and once there are more than
+# max_entries, the least recently used entries are thrown out.
+# The cache can be shared between threads (e.g. the workers of the query server).
+class SuggestionCache:
+    def __init__(self, path='suggestion_cache.db', ttl=7*24*60*60, negative_ttl=24*60*60, max_entries=50000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        # counters for how often the cache saves us a download; see stats()
+        self.hits = 0
+        self.misses = 0
+
+        # only one thread at a time may use the connection
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+        self.connection.execute('CREATE TABLE IF NOT EXISTS suggestions (mode TEXT, word TEXT, results TEXT, '
+                                'fetched_at REAL, last_used REAL, PRIMARY KEY (mode, word))')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS suggestions_last_used ON suggestions (last_used)')
+
+    # returns (True, suggestions) if we have a fresh entry, or (False, None) if the page needs to be downloaded
+    # the suggestions are None for a word the free dictionary didn't recognize
+    def get(self, mode, word):
+        with self.lock:
+            return self.get_unlocked(mode, word)
+
+    def get_unlocked(self, mode, word):
+        row = self.connection.execute('SELECT results, fetched_at, last_used FROM suggestions '
+                                      'WHERE mode = ? AND word = ?', (mode, word)).fetchone()
+        now = time.time()
+
+        if row is not None:
+            results, fetched_at, last_used = row
+            ttl = self.ttl if results is not None else self.negative_ttl
+
+            if now - fetched_at < ttl:
+                # mark the entry as recently used, so it's the last to be evicted; to the nearest minute is
+                # close enough, and saves writing to the disk on every lookup of a popular word
+                if now - last_used > 60:
+                    self.connection.execute('UPDATE suggestions SET last_used = ? WHERE mode = ? AND word = ?',
+                                            (now, mode, word))
+                    self.connection.commit()
+                self.hits += 1
+
+                if results is None:
+                    return True, None
+                return True, json.loads(results)
+
+        self.misses += 1
+        return False, None
+
+    # saves the suggestions for a page; pass None for a word with no suggestions
+    def put(self, mode, word, suggestions):
+        now = time.time()
+        results = json.dumps(suggestions) if suggestions is not None else None
+
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO suggestions VALUES (?, ?, ?, ?, ?)',
+                                    (mode, word, results, now, now))
+            self.evict()
+            self.connection.commit()
+
+    # throws out the least recently used entries once the cache is over its size limit
+    def evict(self):
+        count = self.connection.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+
+        if count > self.max_entries:
+            self.connection.execute('DELETE FROM suggestions WHERE rowid IN (SELECT rowid FROM suggestions '
+                                    'ORDER BY last_used LIMIT ?)', (count - self.max_entries,))
+
+    # hit/miss counts and the current number of entries, to help decide how big the cache should be
+    def stats(self):
+        with self.lock:
+            entries = self.connection.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits, 'misses': self.misses, 'entries': entries,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0.0}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+
+# returns the suggestions for every (mode, word) pair, in the format {(mode, word): suggestions}
+# anything we have cached is read from the cache, and everything else is downloaded all at once and then cached
+# the suggestions are None for any word the free dictionary didn't recognize
+# with errors (see fetch_all_suggestions), a word that couldn't be downloaded is left out and nothing is cached for it
+def get_suggestions(words, cache=None, modes=('s', 'e'), errors=None, **fetch_options):
+    suggestions = {}
+    to_fetch = []
+
+    # check the cache first
+    with span('suggestion_cache'):
+        for word in words:
+            for mode in modes:
+                found = False
+                if cache is not None:
+                    found, cached = cache.get(mode, word)
+
+                if found:
+                    suggestions[(mode, word)] = cached
+                else:
+                    to_fetch.append((mode, word))
+    count_event('cached_pages', len(words) * len(modes) - len(to_fetch))
+
+    # download whatever is left; pages are fetched per word for both modes, so group the missing pairs by word
+    missing_words = list(dict.fromkeys(word for mode, word in to_fetch))
+    if len(missing_words) > 0:
+        with span('fetch_pages'):
+            fetched = fetch_all_suggestions(missing_words, modes=modes, errors=errors, **fetch_options)
+
+        for mode, word in to_fetch:
+            if (mode, word) not in fetched:
+                continue
+            suggestions[(mode, word)] = fetched[(mode, word)]
+
+            if cache is not None:
+                cache.put(mode, word, suggestions[(mode, word)])
+
+    return suggestions
+
+
+
+
+
+
+
+# The two-gram store, two_grams.db, is a local copy of the two-grams from the free dictionary, so searches don't
+# need to download anything. It's filled by harvest_two_grams, which goes through the lexicon downloading the
+# '/s/' and '/e/' pages of every word and saving the two-grams it finds. Each two-gram is stored once, and can be
+# looked up by either of its words. The store also remembers which words have been harvested (and whether the
+# free dictionary recognized them), so a harvest that's stopped partway through picks up where it left off.
+class TwoGramStore:
+    def __init__(self, path='two_grams.db'):
+        # only one thread at a time may use the connection
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+
+        self.connection.execute('CREATE TABLE IF NOT EXISTS two_grams (first TEXT, second TEXT, '
+                                'PRIMARY KEY (first, second)) WITHOUT ROWID')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS two_grams_second ON two_grams (second, first)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS harvested (word TEXT PRIMARY KEY, valid INTEGER, '
+                                'harvested_at REAL) WITHOUT ROWID')
+
+    # returns True or False for whether the free dictionary recognized a harvested word, or None if the word
+    # hasn't been harvested yet
+    def is_valid(self, word):
+        with self.lock:
+            row = self.connection.execute('SELECT valid FROM harvested WHERE word = ?', (word,)).fetchone()
+        return None if row is None else bool(row[0])
+
+    # the second words of every two-gram starting with word
+    def starting_with(self, word):
+        with self.lock:
+            rows = self.connection.execute('SELECT second FROM two_grams WHERE first = ?', (word,)).fetchall()
+        return [row[0] for row in rows]
+
+    # the first words of every two-gram ending with word
+    def ending_with(self, word):
+        with self.lock:
+            rows = self.connection.execute('SELECT first FROM two_grams WHERE second = ?', (word,)).fetchall()
+        return [row[0] for row in rows]
+
+    # saves the suggestions downloaded for a batch of words (in the format returned by fetch_all_suggestions),
+    # and marks the words as harvested; it's all saved at once, so a batch is either saved completely or not at all
+    def save_harvest(self, words, suggestions):
+        now = time.time()
+        two_grams = set()
+        for (mode, word), results in suggestions.items():
+            for split_words in results or []:
+                if len(split_words) == 2:
+                    two_grams.add(tuple(split_words))
+
+        with self.lock:
+            with self.connection:
+                self.connection.executemany('INSERT OR IGNORE INTO two_grams VALUES (?, ?)', sorted(two_grams))
+                self.connection.executemany('INSERT OR REPLACE INTO harvested VALUES (?, ?, ?)',
+                                            [(word, suggestions[('s', word)] is not None, now) for word in words])
+
+        return len(two_grams)
+
+    # the words out of a list that haven't been harvested yet, in the same order
+    def not_harvested(self, words):
+        with self.lock:
+            done = set(row[0] for row in self.connection.execute('SELECT word FROM harvested'))
+        return [word for word in words if word not in done]
+
+    # the number of two-grams and harvested words
+    def stats(self):
+        with self.lock:
+            two_grams = self.connection.execute('SELECT COUNT(*) FROM two_grams').fetchone()[0]
+            harvested = self.connection.execute('SELECT COUNT(*) FROM harvested').fetchone()[0]
+        return {'two_grams': two_grams, 'harvested_words': harvested}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+
+# opens the two-gram store if it has been harvested into; otherwise returns None, and searches download the pages
+def open_two_gram_store(path='two_grams.db'):
+    if not os.path.exists(path):
+        return None
+    return TwoGramStore(path)
+
+
+
+# Fills the two-gram store by downloading the suggestion pages for every word in the lexicon (or the given words)
+# that hasn't been harvested yet, batch_size words at a time; limit stops after that many words.
+# The pages are fetched with fetch_all_suggestions, so the website is never sent more than requests_per_second
+# requests a second. Any new one-grams on the pages are added to the lexicon, the same as a search would.
+# Each batch is saved as soon as it's finished, so stopping the harvest (with Ctrl+C, or a lost connection) loses
+# at most the batch in progress; running it again carries on from there.
+# To try it out without the real website, point DICTIONARY_URL at serve_recorded_pages and harvest a few words.
+def harvest_two_grams(words=None, batch_size=50, limit=None, path='two_grams.db', **fetch_options):
+    # the curation lists apply here the same as in a search, so a blacklisted word is never added (or harvested)
+    lexicon = open_lexicon()
+    lexicon.curate(read_word_list(ADD_WORDS_PATH, DEFAULT_ADD_WORDS), read_word_list(BLACKLIST_PATH, DEFAULT_BLACKLIST))
+    compound_index = open_compound_index(lexicon)
+    if words is None:
+        words = list(lexicon)
+
+    store = TwoGramStore(path)
+    remaining = store.not_harvested(words)
+    already_done = len(words) - len(remaining)
+    if limit is not None:
+        remaining = remaining[:limit]
+
+    print('%d words to harvest (%d already done)' % (len(remaining), already_done))
+
+    t0 = time.perf_counter()
+    harvested = 0
+    try:
+        for start in range(0, len(remaining), batch_size):
+            batch = remaining[start:start + batch_size]
+            suggestions = fetch_all_suggestions(batch, **fetch_options)
+
+            # save the new one-grams first, so a batch is never marked as harvested without them
+            new_one_grams = []
+            add_suggested_one_grams(batch, suggestions, lexicon, new_one_grams)
+            if compound_index is not None:
+                update_compound_index(compound_index, new_one_grams, lexicon)
+            save_lexicon(lexicon, compound_index, new_one_grams)
+
+            found = store.save_harvest(batch, suggestions)
+
+            harvested += len(batch)
+            elapsed = time.perf_counter() - t0
+            print('%d of %d words harvested, %d two-grams in this batch (%.1f words per second)'
+                  % (harvested, len(remaining), found, harvested / elapsed))
+
+    except KeyboardInterrupt:
+        print('Stopped; run again to carry on from here')
+    except Exception as error:
+        print('Stopped after an error (%s); run again to carry on from here' % error)
+
+    stats = store.stats()
+    store.close()
+    print('%d two-grams from %d words in the store' % (stats['two_grams'], stats['harvested_words']))
+
+    return stats
+
+
+
+# clears the contents of the terminal, to help keep things easy to read
+# this prints the escape codes the terminal understands directly, instead of starting a separate 'clear' program
+def clear_terminal():
+    if sys.stdout.isatty():
+        print('\033[2J\033[3J\033[H', end='', flush=True)
+
+
+
+# reads a curation list: one word per line, ignoring blank lines and lines starting with '#'
+# if the file doesn't exist (e.g. only word_puzzles.py was copied over), the default list is used instead
+def read_word_list(path, default=[]):
+    if not os.path.exists(path):
+        return list(default)
+
+    with open(path, encoding='utf-8') as infile:
+        words = [line.strip().lower() for line in infile]
+
+    return [word for word in words if len(word) > 0 and not word.startswith('#')]
+
+
+
+# opens everything the script needs to answer a search: the lexicon (with the manual tweaks applied), the word
+# frequencies, and the compound index
+def load_data():
+    # open the binary version of the data set of one-grams (rebuilt from one_grams.csv whenever that file changes)
+    # the lexicon works like a set of words, so checking whether a word is valid is instant, and it can also
+    # find every word starting or ending with a given piece
+    with span('load_lexicon'):
+        lexicon = open_lexicon()
+
+    # apply the curation lists on top (see ADD_WORDS_PATH and BLACKLIST_PATH below); nothing is rebuilt or saved,
+    # so changing the lists takes effect on the next run
+    lexicon.curate(read_word_list(ADD_WORDS_PATH, DEFAULT_ADD_WORDS), read_word_list(BLACKLIST_PATH, DEFAULT_BLACKLIST))
+
+    # open the word frequencies that line up with the lexicon; we'll use this later
+    # (rebuilt whenever the lexicon has changed)
+    with span('load_frequencies'):
+        frequencies = open_frequencies(lexicon)
+
+    # read in the precomputed index of compound words (see build_compound_index above), building it if it's missing
+    with span('load_compound_index'):
+        compound_index = open_compound_index(lexicon, build=True)
+
+        # the index is built from the saved word list, so work out the compounds made with the curated words
+        # separately; they're kept with the lexicon just for this run, and never saved into compound_index.json
+        if compound_index is not None and len(lexicon.curated) > 0:
+            update_compound_index(lexicon.curated_compounds, lexicon.curated, lexicon)
+
+    return lexicon, frequencies, compound_index
+
+
+
+# Reads the two-grams starting and ending with the user's word off of its suggestion pages (from get_suggestions).
+# Returns (two_grams_start, two_grams_end), or None if the user's word isn't a valid word. Any new one-grams
+# on the pages are added to the lexicon and to the list new_one_grams.
+def scraped_two_grams(user_word, lexicon, new_one_grams, suggestions):
+
+    ## Get starting words ##
+
+    # First, scrape for one-grams that aren't in our existing data set plus two-grams that START with the word
+
+    # if a space is present, or if there were no suggestions on the '/s/' page (meaning the word was not found on
+    # the free dictionary), the user's word is not valid, so stop here
+    if ' ' in user_word or suggestions[('s', user_word)] is None:
+        return None
+
+    # list of all of the suggestions from the '/s/' webpage; each one has already been cleaned of punctuation
+    # and split into a list of one or two words
+    cleaned_results = suggestions[('s', user_word)]
+
+    # initialize an empty list to hold the two-grams starting with the user's word
+    two_grams_start = []
+
+    # loop through all cleaned results/suggestions
+    for split_words in cleaned_results:
+        # if one-gram, check if in the one-grams list already
+        if len(split_words) == 1:
+            # if not, add it; if it's already in the list, just move on
+            if lexicon.add(split_words[0]):
+                new_one_grams.append(split_words[0])
+
+        # if two-gram, check to make sure it meets our criteria
+        elif len(split_words) == 2:
+            # Check the two criteria: first word must be exactly equal to the user word
+            # AND the second word must be in our one-grams data set
+            if split_words[0] == user_word and split_words[1] in lexicon:
+                # if it meets both criteria, add to the list; otherwise, just move on
+                two_grams_start.append(' '.join(split_words))
+
+
+    ## Get ending words ##
+
+    # repeat the above, but now for two-grams that END with the word, using the '/e/' page
+    # if there weren't any suggestions, there's nothing to add
+    cleaned_results = suggestions[('e', user_word)]
+    if cleaned_results is None:
+        cleaned_results = []
+
+    # empty list to store our relevant two-grams
+    two_grams_end = []
+
+    # loop through all cleaned results
+    for split_words in cleaned_results:
+        # if one-gram, check if in the one-grams list already
+        if len(split_words) == 1:
+            # if not, add it; if it's already in the list, just move on
+            if lexicon.add(split_words[0]):
+                new_one_grams.append(split_words[0])
+
+        # if two-gram, check to make sure it meets our criteria
+        elif len(split_words) == 2:
+            # Check the two criteria: second word must be exactly equal to the user word
+            # AND the first word must be in our one-grams data set
+            if split_words[1] == user_word and split_words[0] in lexicon:
+                # if it meets both criteria, add to the list; otherwise, just move on
+                two_grams_end.append(' '.join(split_words))
+
+    return two_grams_start, two_grams_end
+
+
+
+# The two-grams starting and ending with the user's word from the two-gram store, in the same format as
+# scraped_two_grams; the other word of each two-gram must be in our one-grams data set, the same as for the pages
+def local_two_grams(user_word, lexicon, two_gram_store):
+    if ' ' in user_word or not two_gram_store.is_valid(user_word):
+        return None
+
+    two_grams_start = [user_word + ' ' + second for second in two_gram_store.starting_with(user_word)
+                       if second in lexicon]
+    two_grams_end = [first + ' ' + user_word for first in two_gram_store.ending_with(user_word)
+                     if first in lexicon]
+
+    return two_grams_start, two_grams_end
+
+
+
+# Finds all of the one-grams and two-grams that start or end with the user's word, where the rest of the one- or
+# two-gram is also a valid word. Returns (starting, ending), or None if the user's word isn't a valid word.
+# Any new one-grams we find on the web are added to the lexicon and to the list new_one_grams.
+# suggestions can be passed in if they've already been looked up with get_suggestions.
+# If the user's word has been harvested into two_gram_store, its two-grams come from there instead of the web
+# (unless suggestions were passed in).
+def search_word(user_word, lexicon, compound_index, new_one_grams, suggestion_cache=None, suggestions=None,
+                two_gram_store=None):
+
+    #### Two-grams ####
+
+    # if we have the two-grams for the user's word saved locally, there's nothing to download
+    if suggestions is None and two_gram_store is not None and two_gram_store.is_valid(user_word) is not None:
+        with span('local_two_grams'):
+            two_grams = local_two_grams(user_word, lexicon, two_gram_store)
+
+    # otherwise, look up the suggestions on both pages for the user's word: '/s/' indicates "starting" with the
+    # word, and '/e/' indicates "ending" with the word
+    # words we've looked up recently come straight from the cache; otherwise both pages are downloaded at the same time
+    else:
+        if suggestions is None:
+            suggestions = get_suggestions([user_word], suggestion_cache)
+        with span('scraped_two_grams'):
+            two_grams = scraped_two_grams(user_word, lexicon, new_one_grams, suggestions)
+
+    # if the user's word is not valid, stop here
+    if two_grams is None:
+        return None
+    two_grams_start, two_grams_end = two_grams
+
+
+    #### Combine results ####
+
+    ## One-grams made up of the user's word plus another word ##
+
+    # if we have the precomputed compound index, bring it up to date with any new one-grams from the web,
+    # and then the matching one-grams are just a lookup; the index is keyed by valid one-grams, so if the
+    # user's word isn't in our word list yet, fall back to searching the lexicon instead
+    with span('compound_matching'):
+        if compound_index is not None:
+            update_compound_index(compound_index, new_one_grams, lexicon)
+
+        if compound_index is not None and user_word in lexicon:
+            starting_one_grams, ending_one_grams = lookup_compounds(compound_index, user_word)
+
+            # plus the compounds made with the curated words
+            curated_starting, curated_ending = lookup_compounds(lexicon.curated_compounds, user_word)
+            starting_one_grams += list(set(curated_starting) - set(starting_one_grams))
+            ending_one_grams += list(set(curated_ending) - set(ending_one_grams))
+            count_event('candidates_scanned', len(starting_one_grams) + len(ending_one_grams))
+
+            # the compound index doesn't know about the blacklist, so leave out any compound whose other piece is on it
+            if len(lexicon.blacklist) > 0:
+                starting_one_grams = [word for word in starting_one_grams
+                                      if word[len(user_word):] not in lexicon.blacklist]
+                ending_one_grams = [word for word in ending_one_grams
+                                    if word[:-len(user_word)] not in lexicon.blacklist]
+
+        else:
+            # list of all one-grams that start with user_word AND the remainder of the one_gram is also in the list
+            # of acceptable one-grams; the lexicon only hands us the words that actually start with user_word
+            candidates = lexicon.words_with_prefix(user_word)
+            starting_one_grams = find_starting(user_word, candidates, lexicon)
+            count_event('candidates_scanned', len(candidates))
+
+            # same for one-grams ending with our word
+            candidates = lexicon.words_with_suffix(user_word)
+            ending_one_grams = find_ending(user_word, candidates, lexicon)
+            count_event('candidates_scanned', len(candidates))
+
+    # append the lists of two-grams starting and ending with our word to the one-grams,
+    # and clear both lists of any of our blacklisted words
+    starting = [word for word in starting_one_grams + two_grams_start if word not in lexicon.blacklist]
+    ending = [word for word in ending_one_grams + two_grams_end if word not in lexicon.blacklist]
+    count_event('matches_found', len(starting) + len(ending))
+
+    return starting, ending
+
+
+
+# the frequency of a single result; for a two-gram, the frequency of the word at position other_index (see below)
+# if we don't have a frequency available, this will be a zero
+def result_frequency(word, frequencies, other_index):
+    if ' ' in word:
+        return frequencies.get(word.split(' ')[other_index])
+    return frequencies.get(word)
+
+
+
+# Sorts a list of results two ways: alphabetically (ignoring the space in two-grams) and by frequency (most common
+# first). For a two-gram, the frequency is that of the word that isn't the user's word: the word at position
+# other_index of the two-gram (1 for words starting with the user's word, 0 for words ending with it).
+# Returns (alphabetical, by_frequency, counts), where counts is a dictionary in the format {result: frequency}.
+# If top is given, only the top most common results are kept (in both orders); these are picked out with a heap,
+# so a word with thousands of results, like "in" or "out", doesn't need all of them sorted first.
+# known is a {word: frequency} dictionary of frequencies already looked up, like the ones FrequencyStore.with_prefix
+# reads straight off the word IDs; only the other results are looked up one by one.
+def sort_results(results, frequencies, other_index, top=None, known={}):
+    # get the frequency of each result
+    counts = {word: known[word] if word in known else result_frequency(word, frequencies, other_index)
+              for word in results}
+
+    # results with the same frequency stay in the order they came in, either way
+    if top is not None and top < len(results):
+        by_frequency = heapq.nlargest(top, results, key=counts.__getitem__)
+        results = by_frequency
+    else:
+        by_frequency = sorted(results, key=counts.__getitem__, reverse=True)
+
+    # to sort alphabetically, rebuild any two-grams without the space
+    alphabetical = sorted(results, key=lambda word: word.replace(' ', ''))
+
+    return alphabetical, by_frequency, counts
+
+
+
+# The results of a search as a dictionary, the way the query server and batch mode send them back: the words
+# starting and ending with the user's word (alphabetically, each with its frequency) and the number of each.
+# results is what search_word returned, so None means the user's word wasn't valid.
+# With top, only the top most common results on each side are included; the counts are still the full numbers.
+def result_record(user_word, results, frequencies, top=None):
+    if results is None:
+        return {'word': user_word, 'valid': False}
+
+    starting, ending = results
+    starting_count, ending_count = len(starting), len(ending)
+    starting, starting_by_frequency, starting_counts = sort_results(starting, frequencies, 1, top,
+                                                                    frequencies.with_prefix(user_word))
+    ending, ending_by_frequency, ending_counts = sort_results(ending, frequencies, 0, top,
+                                                              frequencies.with_suffix(user_word))
+
+    return {'word': user_word,
+            'valid': True,
+            'starting_count': starting_count,
+            'ending_count': ending_count,
+            'starting': [{'word': word, 'frequency': starting_counts[word]} for word in starting],
+            'ending': [{'word': word, 'frequency': ending_counts[word]} for word in ending]}
+
+
+
+# prints the words ending and starting with the user's word side by side, and the words with the user's word in the
+# middle in a third column if given
+# order is only used for the heading, and says how the lists were sorted: 'alphabetical' or 'frequency'
+# if only the top results are being shown, starting_count, ending_count and middle_count are the full numbers of results
+def print_results(user_word, starting, ending, order='alphabetical', starting_count=None, ending_count=None,
+                  middle=None, middle_count=None):
+    if starting_count is None:
+        starting_count = len(starting)
+    if ending_count is None:
+        ending_count = len(ending)
+    if middle is not None and middle_count is None:
+        middle_count = len(middle)
+
+    # start with displaying the user's word
+    print()
+    print()
+    if order == 'frequency':
+        print('Printing results BY FREQUENCY (most common first):')
+    else:
+        print('Printing results ALPHABETICALLY:')
+    print()
+    print('Words with "' + user_word + '"')
+    if len(starting) < starting_count or len(ending) < ending_count or (middle is not None and len(middle) < middle_count):
+        print('(showing the %d most common on each side)' % max(len(starting), len(ending), len(middle or [])))
+    print()
+
+    # table header
+    header = 'At the end (%-34s              At the beginning (%-16s' % (str(ending_count) + ' results)', str(starting_count) + ' results)')
+    rule = '---------------------------------------------------------------------------------------------------'
+    if middle is not None:
+        header = '%-99s   In the middle (%d results)' % (header, middle_count)
+        rule += '------------------------------'
+    else:
+        middle = []
+    print(header)
+    print(rule)
+
+    # show lists side by side, which means the number of rows in our table = length of the longest list
+    for i in range(max(len(starting), len(ending), len(middle))):
+        try:
+            # start with fetching the beginning piece of words ENDING with our word
+            w1 = ending[i][:-len(user_word)]
+            # then fetch the entire word all together
+            w2 = ending[i]
+        # if we get an error, it means this list was the shorter of the two; just use blank spaces
+        except IndexError:
+            w1 = ''
+            w2 = ''
+
+        try:
+            # start with fetching the entire word
+            w3 = starting[i]
+            # next fetch the end of the word that is left after removing user_word at the beginning
+            w4 = starting[i][len(user_word):]
+            # check for the presence of a space
+            if ' ' in starting[i]:
+                # if we find one, it means this is a two-word phrase, so remove the space from the stem
+                w4 = starting[i][len(user_word)+1:]
+
+        # if we get an error, it means this list was the shorter of the two; just use blank spaces
+        except IndexError:
+            w3 = ''
+            w4 = ''
+
+
+        # when we're out of words in the first column, but still have words to print in the second
+        # column; avoids printing the arrow between the blank spaces
+        if len(w1) == 0 and len(w2) == 0:
+            line = '%-14s       %-38s %-20s -->   %-15s' % (w1, w2, w3, w4)
+
+        # same as above, but for when we have something to print in the first column but not the second
+        elif len(w3) == 0 and len(w4) == 0:
+            line = '%-14s -->   %-38s'  % (w1, w2)
+
+        # this is essentially the default: when we have an entry to print in both columns
+        else:
+            line = '%-14s -->   %-38s %-20s -->   %-15s' % (w1, w2, w3, w4)
+
+        # the third column, if there's anything left in it
+        if i < len(middle):
+            line = '%-99s   %s' % (line, middle[i])
+
+        print(line.rstrip())
+
+
+
+# writes a list of words to one_grams.csv, with the same '0' column header pandas used to write
+# (see write_atomically)
+def write_one_grams(words, path='one_grams.csv'):
+    with write_atomically(path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(['0'])
+        writer.writerows([word] for word in words)
+
+
+
+# saves any changes that were made to the lexicon during the run
+# the changes are appended to the journal, so a run that changed nothing writes nothing at all
+def save_lexicon(lexicon, compound_index, new_one_grams):
+    # the compounds made with new one-grams go in the journal with them (compound_index.json is only rewritten
+    # when the journal is compacted)
+    if compound_index is not None and len(new_one_grams) > 0:
+        lexicon.changes += compound_changes(new_one_grams, lexicon)
+
+    if len(lexicon.changes) > 0:
+        lexicon.journal_length = append_to_journal(lexicon.changes)
+        lexicon.changes = []
+
+    # every so often, fold the journal back into one_grams.csv
+    if lexicon.journal_length >= JOURNAL_COMPACT_AT:
+        compact_lexicon()
+        lexicon.journal_length = 0
+
+
+
+# The query server keeps everything loaded between searches: the lexicon, frequencies, compound index and
+# suggestion cache are opened once, and then any number of searches are answered over a local web address, e.g.
+#   http://localhost:8080/search?word=bird
+# Each search returns JSON with the words starting and ending with the searched word (alphabetically, each with
+# its frequency) and the number of each; an invalid word gets back a 'did_you_mean' list of likely corrections
+# instead (see did_you_mean). Each connection gets a thread of its own, but at most workers searches run at once;
+# the pages are downloaded by each search on its own, and only the quick step of updating the word list happens one
+# at a time.
+# With live, every word is looked up on the web, even words in the two-gram store (like --live).
+# All the workers share one session and one rate limiter, so connections to the website are reused from one search
+# to the next, and the website never gets more than its requests per second from the server as a whole.
+class QueryServerState:
+    def __init__(self, live=False, workers=8):
+        self.lexicon, self.frequencies, self.compound_index = load_data()
+        self.suggestion_cache = SuggestionCache()
+        self.two_gram_store = None if live else open_two_gram_store()
+        self.spelling_index = open_spelling_index(self.lexicon)
+        self.lock = threading.Lock()
+        self.workers = threading.BoundedSemaphore(workers)
+
+        # each search fetches its two pages at the same time, so allow two connections per worker
+        self.session = make_session(pool_size=2 * workers)
+        self.rate_limiter = HostRateLimiter()
+
+    # answers a single search, in the same format the server sends back (see result_record)
+    def search(self, user_word, top=None):
+        with self.workers:
+            return self.search_now(user_word.lower(), top)
+
+    def search_now(self, user_word, top):
+
+        # the slow part (the cache or the web) happens outside the lock, so workers can wait on it at the same time;
+        # words in the two-gram store don't need it at all
+        suggestions = None
+        if self.two_gram_store is None or self.two_gram_store.is_valid(user_word) is None:
+            suggestions = get_suggestions([user_word], self.suggestion_cache, session=self.session,
+                                          rate_limiter=self.rate_limiter)
+
+        with self.lock:
+            new_one_grams = []
+            results = search_word(user_word, self.lexicon, self.compound_index, new_one_grams,
+                                  suggestions=suggestions, two_gram_store=self.two_gram_store)
+            if results is not None:
+                save_lexicon(self.lexicon, self.compound_index, new_one_grams)
+
+        record = result_record(user_word, results, self.frequencies, top)
+        if results is None:
+            record['did_you_mean'] = did_you_mean(user_word, self.lexicon, self.frequencies, self.spelling_index)
+        return record
+
+
+
+# creates the query server (see QueryServerState above); call serve_forever() on it to start answering searches
+def make_query_server(port=8080, workers=8, live=False):
+    import http.server
+    from urllib.parse import parse_qs
+    import requests
+
+    state = QueryServerState(live, workers)
+
+    class QueryHandler(http.server.BaseHTTPRequestHandler):
+        # keep connections open between requests, and send each response straight away; the headers and body go
+        # out in separate writes, and otherwise the body waits on the client acknowledging the headers
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        # hang up on a connection that's been idle this many seconds, so its thread doesn't wait on it forever
+        timeout = 10
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            word = query.get('word', [''])[0]
+            top = query.get('top', [''])[0]
+
+            if url.path == '/search' and len(word) > 0 and (top == '' or top.isdigit()):
+                # if the free dictionary can't be reached, say so rather than hanging up without an answer
+                try:
+                    status, response = 200, state.search(word, int(top) if top else None)
+                except requests.RequestException as error:
+                    status, response = 502, {'word': word.lower(), 'error': str(error)}
+            elif url.path == '/stats':
+                status, response = 200, state.suggestion_cache.stats()
+            else:
+                status, response = 404, {'error': 'use /search?word=<word>[&top=<number>] or /stats'}
+
+            body = json.dumps(response).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # don't print a line to the console for every request
+        def log_message(self, format, *args):
+            pass
+
+    # answers each connection on a thread of its own, so a client keeping its connection open between searches never
+    # holds up anyone else; it's the searches themselves that are limited to workers at a time (see QueryServerState)
+    # the connection threads are daemon threads, so they don't keep the script running once the server is closed
+    class QueryServer(http.server.ThreadingHTTPServer):
+        daemon_threads = True
+
+        def server_close(self):
+            super().server_close()
+            state.session.close()
+            state.suggestion_cache.close()
+            if state.two_gram_store is not None:
+                state.two_gram_store.close()
+
+    return QueryServer(('localhost', port), QueryHandler)
+
+
+
+# runs the query server until it's stopped with Ctrl+C
+def serve(port=8080, workers=8, live=False):
+    server = make_query_server(port, workers, live)
+    print('Answering searches at http://localhost:%d/search?word=<word> with %d workers (Ctrl+C to stop)'
+          % (port, workers))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+
+# sends searches to a running query server from several clients at once, and reports the number of searches
+# answered per second along with the median (p50) and 99th percentile (p99) time per search
+def load_test(seed_words=['bird', 'water', 'light', 'house', 'fire'], port=8080, clients=8, requests_per_client=200):
+    import http.client
+
+    latencies = []
+    lock = threading.Lock()
+
+    # each client keeps one connection open and sends its searches one after another
+    def client(client_number):
+        connection = http.client.HTTPConnection('localhost', port)
+        times = []
+        for i in range(requests_per_client):
+            word = seed_words[(client_number + i) % len(seed_words)]
+            t0 = time.perf_counter()
+            connection.request('GET', '/search?word=' + word)
+            connection.getresponse().read()
+            times.append(time.perf_counter() - t0)
+        connection.close()
+
+        with lock:
+            latencies.extend(times)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    report = {'searches': len(latencies),
+              'clients': clients,
+              'queries_per_second': len(latencies) / elapsed,
+              'p50_ms': latencies[len(latencies) // 2] * 1000,
+              'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000}
+
+    print('%d searches from %d clients: %.1f searches per second, p50 %.2f ms, p99 %.2f ms'
+          % (report['searches'], clients, report['queries_per_second'], report['p50_ms'], report['p99_ms']))
+
+    return report
+
+
+
+# Batch mode answers a whole list of words in one run, e.g. every word in a puzzle, instead of one word per run.
+# It works in two steps:
+#   1. the suggestions for every word are looked up at once (each word only once, however many times it's listed,
+#      and straight from the cache where we can), and any new one-grams are added to the word list
+#   2. the words are shared out between several processes, which each open the lexicon, frequencies and compound
+#      index themselves; the lexicon and frequencies are memory-mapped, so the processes all read the same copy
+# Results are written out as each word finishes, rather than all at the end.
+
+# the data each batch worker process opened when it started (see start_batch_worker below)
+batch_data = None
+
+
+
+# reads the words for batch mode, one per line (blank lines are skipped), from a file or '-' for the keyboard/stdin
+def read_batch_words(path):
+    infile = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        words = [line.strip().lower() for line in infile]
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+
+    return [word for word in words if len(word) > 0]
+
+
+
+# adds every new one-gram found in the suggestions for the given words to the lexicon, the same as search_word
+# would (only for words that turned out to be valid), and to the list new_one_grams
+def add_suggested_one_grams(words, suggestions, lexicon, new_one_grams):
+    for word in words:
+        if ' ' in word or suggestions[('s', word)] is None:
+            continue
+
+        for mode in ('s', 'e'):
+            for split_words in suggestions[(mode, word)] or []:
+                if len(split_words) == 1 and lexicon.add(split_words[0]):
+                    new_one_grams.append(split_words[0])
+
+
+
+# runs once in each batch worker process, to open the data files (and the two-gram store, if there is one)
+def start_batch_worker():
+    global batch_data
+    batch_data = load_data() + (open_two_gram_store(),)
+
+
+
+# answers one word in a batch worker process; the suggestions for the word are passed in from step 1, or are None
+# if the word's two-grams are in the two-gram store
+def batch_search(item):
+    user_word, suggestions, top = item
+    lexicon, frequencies, compound_index, two_gram_store = batch_data
+
+    # every new one-gram was already added in step 1, so nothing here changes the word list
+    results = search_word(user_word, lexicon, compound_index, [], suggestions=suggestions,
+                          two_gram_store=two_gram_store)
+
+    record = result_record(user_word, results, frequencies, top)
+    if results is None:
+        record['did_you_mean'] = did_you_mean(user_word, lexicon, frequencies)
+    return record
+
+
+
+# runs step 2 of batch mode for a list of (word, suggestions, top) items, handing back each result as soon as it's ready
+# (in whatever order they finish); with one process, everything is done here without starting any new processes
+def batch_results(items, processes=1, chunk_size=16):
+    if processes <= 1:
+        if batch_data is None:
+            start_batch_worker()
+        for item in items:
+            yield batch_search(item)
+        return
+
+    import multiprocessing
+
+    with multiprocessing.Pool(processes, initializer=start_batch_worker) as pool:
+        yield from pool.imap_unordered(batch_search, items, chunksize=chunk_size)
+
+
+
+# writes batch results out as they arrive: one JSON object per line (jsonl), or one row per result (csv) with the
+# columns word, side ('starting' or 'ending', or 'invalid' if the word wasn't valid), result and frequency
+# a word whose pages couldn't be downloaded has an 'error' in its record instead, written in csv as the side 'error'
+# with the error message as the result
+def write_batch_results(records, outfile, output_format='jsonl'):
+    writer = csv.writer(outfile) if output_format == 'csv' else None
+    if writer is not None:
+        writer.writerow(['word', 'side', 'result', 'frequency'])
+
+    count = 0
+    for record in records:
+        if writer is None:
+            outfile.write(json.dumps(record) + '\n')
+        elif 'error' in record:
+            writer.writerow([record['word'], 'error', record['error'], ''])
+        elif not record['valid']:
+            writer.writerow([record['word'], 'invalid', '', ''])
+        else:
+            for side in ('starting', 'ending'):
+                writer.writerows([record['word'], side, result['word'], result['frequency']]
+                                 for result in record[side])
+        outfile.flush()
+        count += 1
+
+    return count
+
+
+
+# runs a whole batch: reads the words from path ('-' for stdin) and writes the results to outfile
+# fetch_options are passed on to fetch_all_suggestions (e.g. max_workers, requests_per_second)
+# with top, only the top most common results for each word are written
+def run_batch(path, outfile=sys.stdout, output_format='jsonl', processes=None, top=None, **fetch_options):
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    t0 = time.perf_counter()
+    words = list(dict.fromkeys(read_batch_words(path)))
+
+    # step 1: look up the suggestions for every word at once (except for words in the two-gram store, which
+    # don't need them), and add the new one-grams to the word list
+    lexicon, frequencies, compound_index = load_data()
+    two_gram_store = open_two_gram_store()
+    to_fetch = [word for word in words if two_gram_store is None or two_gram_store.is_valid(word) is None]
+    if two_gram_store is not None:
+        two_gram_store.close()
+
+    # a word whose pages can't be downloaded gets an error in its record, and the rest of the batch carries on
+    errors = {}
+    suggestion_cache = SuggestionCache()
+    suggestions = get_suggestions(to_fetch, suggestion_cache, errors=errors, **fetch_options)
+    suggestion_cache.close()
+    to_fetch = [word for word in to_fetch if word not in errors]
+
+    new_one_grams = []
+    add_suggested_one_grams(to_fetch, suggestions, lexicon, new_one_grams)
+    if compound_index is not None:
+        update_compound_index(compound_index, new_one_grams, lexicon)
+
+    # save the word list before the workers start, so they open it with the new one-grams already in it
+    save_lexicon(lexicon, compound_index, new_one_grams)
+    t1 = time.perf_counter()
+
+    # step 2: split up the words between the worker processes
+    fetched = set(to_fetch)
+    items = [(word, {(mode, word): suggestions[(mode, word)] for mode in ('s', 'e')} if word in fetched else None, top)
+             for word in words if word not in errors]
+    error_records = [{'word': word, 'error': error} for word, error in errors.items()]
+    count = write_batch_results(itertools.chain(error_records, batch_results(items, processes)), outfile,
+                                output_format)
+    t2 = time.perf_counter()
+
+    print('%d words: %.2f s looking up suggestions, %.2f s searching with %d processes (%.1f words per second)'
+          % (count, t1 - t0, t2 - t1, processes, count / max(t2 - t1, 1e-9)), file=sys.stderr)
+
+
+
+# measures how many words per second step 2 of batch mode gets through with 1 process, 2 processes, and so on up
+# to max_processes (all of the computer's cores by default); the suggestions are looked up once beforehand,
+# so only the searching is timed
+def benchmark_batch(path, max_processes=None, **fetch_options):
+    if max_processes is None:
+        max_processes = os.cpu_count() or 1
+
+    words = list(dict.fromkeys(read_batch_words(path)))
+    suggestion_cache = SuggestionCache()
+    suggestions = get_suggestions(words, suggestion_cache, **fetch_options)
+    suggestion_cache.close()
+    items = [(word, {(mode, word): suggestions[(mode, word)] for mode in ('s', 'e')}, None) for word in words]
+
+    report = []
+    print('processes    words per second    speedup', file=sys.stderr)
+    for processes in range(1, max_processes + 1):
+        t0 = time.perf_counter()
+        count = sum(1 for record in batch_results(items, processes))
+        elapsed = time.perf_counter() - t0
+
+        report.append({'processes': processes, 'words_per_second': count / elapsed})
+        print('%9d    %16.1f    %6.2fx' % (processes, report[-1]['words_per_second'],
+                                           report[-1]['words_per_second'] / report[0]['words_per_second']),
+              file=sys.stderr)
+
+    return report
+
+
+
+# one writer for stress_test_lexicon: each round opens the lexicon fresh, adds a word of its own, a compound of
+# it ('<word>bird'), and a word every writer adds, and saves them the way a normal run does
+# returns the words it added, how long it took, and how much of that was spent saving
+def stress_writer(directory, writer, rounds, compact_at):
+    global JOURNAL_COMPACT_AT
+    os.chdir(directory)
+    JOURNAL_COMPACT_AT = compact_at
+
+    added = []
+    save_time = 0
+    t0 = time.perf_counter()
+    for i in range(rounds):
+        lexicon = open_lexicon()
+        compound_index = open_compound_index(lexicon)
+
+        word = 'q%dz%de' % (writer, i)
+        new_one_grams = [new_word for new_word in (word, word + 'bird', 'shared%de' % i) if lexicon.add(new_word)]
+        update_compound_index(compound_index, new_one_grams, lexicon)
+
+        t1 = time.perf_counter()
+        save_lexicon(lexicon, compound_index, new_one_grams)
+        save_time += time.perf_counter() - t1
+        added += [word, word + 'bird']
+
+    return added, time.perf_counter() - t0, save_time
+
+
+
+# one reader for stress_test_lexicon: keeps opening the lexicon until the writers are done, and checks that every
+# snapshot is whole: no half-written words, no base words missing, and never fewer words than the one before
+# returns the number of snapshots read and a list of any problems found
+def stress_reader(directory, base_words):
+    os.chdir(directory)
+    base_words = set(base_words)
+    word_pattern = re.compile(r'q\d+z\d+e(bird)?|shared\d+e')
+
+    snapshots = 0
+    problems = []
+    previous = 0
+    while not os.path.exists('stress.done'):
+        words = set(open_lexicon())
+        snapshots += 1
+
+        torn = [word for word in words - base_words if not word_pattern.fullmatch(word)]
+        if len(torn) > 0:
+            problems.append('half-written words %s' % torn[:3])
+        if not base_words <= words:
+            problems.append('%d base words missing' % len(base_words - words))
+        if len(words) < previous:
+            problems.append('went from %d words to %d' % (previous, len(words)))
+        previous = len(words)
+
+    return snapshots, problems
+
+
+
+# Runs writers copies of the script saving new words to the same lexicon at once, while readers more copies keep
+# opening it, then checks that every word any of them saved is in the lexicon and the compound index, and that no
+# reader ever saw a broken lexicon. It works on a copy of the real lexicon and compound index in a temporary
+# directory, and compacts the journal every compact_at changes so that happens plenty of times during the test too.
+# only needed to check that the lexicon is safe to share between many copies of the script; leaving it here for reference
+def stress_test_lexicon(writers=8, readers=2, rounds=50, compact_at=300):
+    import shutil
+    import tempfile
+
+    base_words = list(open_lexicon().saved_words())
+    directory = tempfile.mkdtemp(prefix='word_puzzles_stress_')
+    home = os.getcwd()
+
+    try:
+        os.chdir(directory)
+        write_one_grams(base_words)
+        build_binary_lexicon(base_words)
+        build_compound_index(base_words)
+
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(writers + readers) as pool:
+            reader_futures = [pool.submit(stress_reader, directory, base_words) for _ in range(readers)]
+            writer_futures = [pool.submit(stress_writer, directory, writer, rounds, compact_at)
+                              for writer in range(writers)]
+            # the readers stop once the writers are done, even if one of the writers failed
+            try:
+                written = [future.result() for future in writer_futures]
+                elapsed = time.perf_counter() - t0
+            finally:
+                open('stress.done', 'w').close()
+            read = [future.result() for future in reader_futures]
+
+        # every word any writer added should have made it, and every compound should be in the compound index
+        expected = set(itertools.chain.from_iterable(added for added, seconds, save_seconds in written))
+        expected |= {'shared%de' % i for i in range(rounds)}
+        lexicon = open_lexicon()
+        missing = [word for word in expected if word not in lexicon]
+        compounds = set(open_compound_index(lexicon)['ending'].get('bird', []))
+        missing_compounds = [word for word in expected if word.endswith('ebird') and word not in compounds]
+        problems = list(itertools.chain.from_iterable(reader_problems for snapshots, reader_problems in read))
+    finally:
+        os.chdir(home)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    saves = writers * rounds
+    save_time = sum(save_seconds for added, seconds, save_seconds in written)
+    print('%d writers saved %d times in %.2f s (%.0f saves/s, %.1f ms per save); %d readers read %d snapshots'
+          % (writers, saves, elapsed, saves / elapsed, save_time / saves * 1000, readers,
+             sum(snapshots for snapshots, reader_problems in read)))
+    print('%d of %d words missing, %d compounds missing, %d problems seen by readers'
+          % (len(missing), len(expected), len(missing_compounds), len(problems)))
+    for problem in (missing[:5] + missing_compounds[:5] + problems[:5]):
+        print('    %s' % problem)
+
+    return {'writers': writers, 'readers': readers, 'saves': saves, 'seconds': elapsed,
+            'save_ms': save_time / saves * 1000, 'missing': missing, 'missing_compounds': missing_compounds,
+            'problems': problems}
+
+
+
+# times how long the script takes to get to the "Type any word" prompt, in a fresh Python process each time,
+# and lists the slowest imports as reported by python -X importtime
+# this is only needed to check the speed of startup; leaving it here for reference
+def benchmark_startup(runs=5, slowest=10):
+    import subprocess
+
+    # import the script and load everything a search needs, exactly as main() does before prompting
+    command = [sys.executable, '-X', 'importtime', '-c', 'import word_puzzles; word_puzzles.load_data()']
+
+    times = []
+    for i in range(runs):
+        t0 = time.perf_counter()
+        process = subprocess.run(command, cwd=dname, capture_output=True, text=True, check=True)
+        times.append(time.perf_counter() - t0)
+
+    # each line of the importtime report looks like: "import time: self [us] | cumulative | imported package"
+    imports = []
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and 'cumulative' not in line:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            imports.append((int(cumulative_us), name.rstrip()))
+
+    # only the modules imported directly (not the ones they import in turn) are indented by a single space
+    top_level = sorted([item for item in imports if not item[1].startswith('  ')], reverse=True)
+
+    print('Startup to prompt: best %.3f seconds, median %.3f seconds over %d runs'
+          % (min(times), sorted(times)[len(times) // 2], runs))
+    print('pandas imported: %s' % any(name.strip() == 'pandas' for us, name in imports))
+    print()
+    print('Slowest imports (cumulative):')
+    for cumulative_us, name in top_level[:slowest]:
+        print('%10.1f ms  %s' % (cumulative_us / 1000, name.strip()))
+
+
+
+# The benchmark suite times each part of the script without any typing or internet connection: startup, loading
+# the lexicon and frequencies, the start/end matching for a fixed set of seed words, reading the recorded pages in
+# the fixtures folder, fetching them from the local stand-in server, ranking, saving one_grams.csv and rebuilding
+# one_grams.lex. Files are only written to a temporary folder.
+# The results are saved to benchmark_results.json; if there's a baseline file (a results file saved earlier, e.g. on
+# the main branch), every timing is compared against it and any that got more than threshold times slower are
+# listed as regressions.
+
+# the seed words: very common prefixes with thousands of results, everyday words, and long words
+BENCHMARK_SEED_WORDS = {'common': ['in', 'out', 'un', 're'],
+                        'everyday': ['bird', 'water', 'light', 'house', 'fire'],
+                        'long': ['establishment', 'international', 'counterrevolutionary']}
+
+
+
+# runs function repeats times and returns its median and best time in milliseconds
+def time_stage(function, repeats=5):
+    times = []
+    for i in range(repeats):
+        t0 = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+
+    return {'median_ms': times[len(times) // 2] * 1000, 'min_ms': times[0] * 1000, 'runs': repeats}
+
+
+
+# runs every benchmark and returns the results in the format {name: {'median_ms', 'min_ms', 'runs'}}
+# everything runs on a copy of the word list in a temporary folder, with its own compound index and made-up word
+# frequencies, so the results are the same on a clean checkout as on a copy that's been in use for a while
+def benchmark_suite(repeats=5, directory='fixtures'):
+    global DICTIONARY_URL
+    import platform
+    import shutil
+    import subprocess
+    import tempfile
+
+    results = {}
+    directory = os.path.abspath(directory)
+
+    base_words = list(open_lexicon().saved_words())
+    temp_directory = tempfile.mkdtemp(prefix='word_puzzles_benchmark_')
+    home = os.getcwd()
+
+    try:
+        os.chdir(temp_directory)
+        write_one_grams(base_words)
+        build_binary_lexicon(base_words)
+        build_compound_index(base_words)
+
+        # the counts only need to be spread out like real ones, and the same every time
+        with open('word_freqs.json', 'w') as outfile:
+            json.dump({word: zlib.crc32(word.encode('utf-8')) % 1000000 for word in base_words}, outfile)
+
+        # startup: a fresh Python process importing the script and loading everything a search needs
+        command = [sys.executable, '-c',
+                   'import os, word_puzzles; os.chdir(%r); word_puzzles.load_data()' % temp_directory]
+        results['startup'] = time_stage(lambda: subprocess.run(command, cwd=dname, capture_output=True, check=True),
+                                        repeats)
+
+        # loading the data files
+        results['load_lexicon'] = time_stage(open_lexicon, repeats)
+        lexicon, frequencies, compound_index = load_data()
+        results['load_frequencies'] = time_stage(lambda: open_frequencies(lexicon), repeats)
+        results['load_compound_index'] = time_stage(load_compound_index, repeats)
+
+        # start/end matching for each seed word; the suggestion pages are left empty, so only the matching is timed
+        for group, seed_words in BENCHMARK_SEED_WORDS.items():
+            suggestions = {(mode, word): [] for word in seed_words for mode in ('s', 'e')}
+            found = {}
+
+            def match():
+                for word in seed_words:
+                    found[word] = search_word(word, lexicon, compound_index, [], suggestions=suggestions)
+
+            def rank():
+                for word in seed_words:
+                    sort_results(found[word][0], frequencies, 1)
+                    sort_results(found[word][1], frequencies, 0)
+
+            results['match_' + group] = time_stage(match, repeats)
+            results['rank_' + group] = time_stage(rank, repeats)
+
+        # the original approach to the matching, for comparison: scan every word, and check the remainder against the
+        # list of words; only the everyday words, since a common prefix like 'in' takes several seconds this way
+        naive = {}
+
+        def match_naive():
+            for word in BENCHMARK_SEED_WORDS['everyday']:
+                naive[word] = ([other for other in base_words if len(other) > len(word) and other[:len(word)] == word
+                                and other[len(word):] in base_words],
+                               [other for other in base_words if len(other) > len(word) and other[-len(word):] == word
+                                and other[:-len(word)] in base_words])
+
+        results['match_naive_everyday'] = time_stage(match_naive, repeats)
+
+        # the two approaches should always agree
+        for word, (starting, ending) in naive.items():
+            found = search_word(word, lexicon, compound_index, [], suggestions={('s', word): [], ('e', word): []})
+            assert sorted(starting) == sorted(found[0]) and sorted(ending) == sorted(found[1]), word
+
+        # reading the suggestions off of the recorded pages
+        texts = []
+        for mode in ['s', 'e']:
+            for filename in sorted(os.listdir(os.path.join(directory, mode))):
+                with open(os.path.join(directory, mode, filename), encoding='utf-8') as infile:
+                    texts.append(infile.read())
+        results['parse_pages'] = time_stage(lambda: [list(parse_suggestions([text])) for text in texts], repeats)
+
+        # the original extraction, for comparison, plus the same cleaning the main script used to do afterwards
+        def parse_original():
+            return [[result.split(' ') for result in extract_suggestions(text)
+                     if '-' not in result and '(' not in result and ',' not in result and len(result.split(' ')) <= 2]
+                    for text in texts]
+
+        results['parse_pages_original'] = time_stage(parse_original, repeats)
+
+        # the two approaches should always agree
+        assert parse_original() == [list(parse_suggestions([text])) for text in texts]
+
+        # fetching the recorded pages from the local stand-in server
+        fixture_words = [filename[:-len('.html')] for filename in sorted(os.listdir(os.path.join(directory, 's')))]
+        server = serve_recorded_pages(directory=directory, port=0)
+        original_url = DICTIONARY_URL
+        DICTIONARY_URL = 'http://localhost:%d' % server.server_address[1]
+        try:
+            results['fetch_pages'] = time_stage(
+                lambda: fetch_all_suggestions(fixture_words, requests_per_second=1000), repeats)
+        finally:
+            DICTIONARY_URL = original_url
+            server.shutdown()
+
+        # saving and rebuilding the word list
+        words = list(lexicon)
+        results['save_one_grams'] = time_stage(lambda: write_one_grams(words, 'saved.csv'), repeats)
+        results['build_lexicon'] = time_stage(lambda: build_binary_lexicon(words, 'saved.lex'), repeats)
+
+    finally:
+        os.chdir(home)
+        shutil.rmtree(temp_directory, ignore_errors=True)
+
+    return {'python': platform.python_version(), 'machine': platform.platform(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'), 'results': results}
+
+
+
+# runs the benchmark suite, saves the results to output, and compares them against the baseline file if there is one
+# (with save_baseline, the results are saved as the new baseline instead)
+# returns the list of regressions: benchmarks more than threshold times slower than the baseline (ignoring anything
+# that's slower by less than min_difference_ms, which is just noise)
+# the best time of each benchmark is compared, since it's the least affected by whatever else the computer is doing
+def run_benchmarks(output='benchmark_results.json', baseline='benchmark_baseline.json', save_baseline=False,
+                   threshold=1.3, min_difference_ms=0.1, repeats=5):
+    report = benchmark_suite(repeats)
+
+    with open(baseline if save_baseline else output, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+
+    previous = None
+    if not save_baseline and os.path.exists(baseline):
+        with open(baseline) as infile:
+            previous = json.load(infile)['results']
+
+    print('%-22s %12s %12s %8s' % ('benchmark', 'best', 'baseline', 'ratio'))
+    print('-' * 58)
+
+    regressions = []
+    for name, result in report['results'].items():
+        if previous is None or name not in previous:
+            print('%-22s %9.3f ms' % (name, result['min_ms']))
+            continue
+
+        before = previous[name]['min_ms']
+        ratio = result['min_ms'] / before if before > 0 else 1.0
+        slower = ratio > threshold and result['min_ms'] - before > min_difference_ms
+        if slower:
+            regressions.append(name)
+
+        print('%-22s %9.3f ms %9.3f ms %7.2fx%s' % (name, result['min_ms'], before, ratio,
+                                                   '  SLOWER' if slower else ''))
+
+    print()
+    if save_baseline:
+        print('Saved as the new baseline in ' + baseline)
+    elif previous is None:
+        print('Saved to %s; no baseline to compare against (run with --save-baseline to make one)' % output)
+    else:
+        print('Saved to %s; %d regressions against %s' % (output, len(regressions), baseline))
+
+    return regressions
+
+
+
+
+
+
+
+#### MAIN #################################################################################################################
+    
+
+#### Call above functions, if necessary ####
+    
+# only call this function to reset the data set of one grams! Otherwise, leave it commented out
+# clean_and_build_file()
+
+# only call this function to reset the data set of word frequencies; otherwise, leave it commented out
+# build_and_export_frequencies()
+
+# only call this function to rebuild the index of words that split into two one-grams (it's built automatically the
+# first time it's needed); otherwise, leave it commented out
+# build_compound_index()
+
+# everything else is run with the options in parse_arguments below (e.g. --compact, --benchmark or --harvest)
+
+
+
+#### Manual tweaks to the word list ####
+
+# words that we noticed are not in the word list that we would like added, one per line
+ADD_WORDS_PATH = 'add_words.txt'
+
+# words that should never be added to the word list, and are left out if they are already present, one per line
+BLACKLIST_PATH = 'blacklisted_words.txt'
+
+# the lists to use if either file is missing; keep these the same as the files
+DEFAULT_ADD_WORDS = ['gam']
+DEFAULT_BLACKLIST = []
+
+
+
+#### Run a search ####
+
+# reads the options the script was run with; with no options, the script asks for a single word as usual
+def parse_arguments(arguments=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Find words and phrases that start or end with a word.')
+    parser.add_argument('--serve', action='store_true',
+                        help='keep running and answer searches at http://localhost:PORT/search?word=<word>')
+    parser.add_argument('--load-test', action='store_true',
+                        help='measure the searches per second and response times of a running server')
+    parser.add_argument('--port', type=int, default=8080, help='port for --serve and --load-test (default 8080)')
+    parser.add_argument('--workers', type=int, default=8, help='searches answered at once by --serve (default 8)')
+    parser.add_argument('--clients', type=int, default=8, help='simultaneous clients for --load-test (default 8)')
+    parser.add_argument('--requests', type=int, default=200, help='searches per client for --load-test (default 200)')
+    parser.add_argument('--top', type=int, metavar='K', help='only show the K most common results on each side')
+    parser.add_argument('--sort', choices=['alphabetical', 'frequency'], default='alphabetical',
+                        help='order to print the results in (default alphabetical)')
+    parser.add_argument('--segment', action='store_true',
+                        help='list every way to split the word into smaller words, instead of searching for it')
+    parser.add_argument('--min-parts', type=int, default=2, help='fewest pieces for --segment (default 2)')
+    parser.add_argument('--max-parts', type=int, default=4, help='most pieces for --segment (default 4)')
+    parser.add_argument('--min-part-length', type=int, default=1,
+                        help='shortest piece for --segment, in letters (default 1)')
+    parser.add_argument('--anagram', action='store_true',
+                        help='list the anagrams of the word and the words made from its letters, instead of searching')
+    parser.add_argument('--pattern', metavar='PATTERN',
+                        help="only show results matching a pattern, where ? is any letter and * is any letters; "
+                             "a pattern can also be typed in place of a word to list every word matching it")
+    parser.add_argument('--contains', action='store_true',
+                        help='list every word containing the word anywhere, instead of searching for it')
+    parser.add_argument('--live', action='store_true',
+                        help='always look up two-grams on the web, even for words in the two-gram store')
+    parser.add_argument('--harvest', action='store_true',
+                        help='download the two-grams of every word in the lexicon into the two-gram store')
+    parser.add_argument('--limit', type=int, help='with --harvest, stop after this many words')
+    parser.add_argument('--compact', action='store_true',
+                        help='fold the journal of word list changes back into one_grams.csv and the files built from it')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='time every part of the script and compare against benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='with --benchmark, save the timings as the new baseline')
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='FILE',
+                        help='save how long each stage took to a JSON file (default profile.json)')
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help='also save detailed cProfile statistics to FILE, for python -m pstats')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='search every word in FILE (one per line, or - for stdin) and write the results to stdout')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                        help='output format for --batch (default jsonl)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes for --batch (default: one per core)')
+    parser.add_argument('--scaling', action='store_true',
+                        help='with --batch, report the words per second with 1 process up to --processes instead')
+
+    return parser.parse_args(arguments)
+
+
+
+def main(arguments=None):
+    options = parse_arguments(arguments)
+
+    if options.profile is None and options.cprofile is None:
+        run(options)
+        return
+
+    # with --profile or --cprofile, time the whole run and save the report(s) at the end, even if it was stopped
+    start_profiling()
+    if options.cprofile is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        run(options)
+
+    finally:
+        if options.cprofile is not None:
+            profiler.disable()
+            profiler.dump_stats(options.cprofile)
+            print('Saved the cProfile statistics to %s (view them with python -m pstats %s)'
+                  % (options.cprofile, options.cprofile))
+
+        report = stop_profiling()
+        path = options.profile or 'profile.json'
+        with open(path, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+        print('Saved the timing report to %s (%.1f ms in total)' % (path, report['total_ms']))
+
+
+
+# runs the script the way the options say to; see main
+def run(options):
+    # other ways to run the script: as a server, or to load test a server
+    if options.serve:
+        serve(options.port, options.workers, options.live)
+        return
+    if options.load_test:
+        load_test(port=options.port, clients=options.clients, requests_per_client=options.requests)
+        return
+    if options.benchmark:
+        regressions = run_benchmarks(save_baseline=options.save_baseline)
+        sys.exit(1 if len(regressions) > 0 else 0)
+    if options.harvest:
+        harvest_two_grams(limit=options.limit)
+        return
+    if options.compact:
+        compact_lexicon(rebuild_indexes=True)
+        return
+    if options.batch is not None and options.scaling:
+        benchmark_batch(options.batch, options.processes)
+        return
+    if options.batch is not None:
+        run_batch(options.batch, output_format=options.format, processes=options.processes, top=options.top)
+        return
+
+    # clear the contents of the terminal at the start of each run, to help keep things easy to read
+    clear_terminal()
+
+    # read in the data files
+    lexicon, frequencies, compound_index = load_data()
+
+    # keep track of any one-grams we add from the web, so the compound index can be brought up to date
+    new_one_grams = []
+
+
+    # get input from the user for the word of interest, and set to lowercase
+    with span('waiting_for_input'):
+        user_word = input("\nType any word: ")
+    user_word = user_word.lower()
+
+
+    # to split the word into smaller words, only the lexicon is needed, so there's nothing to look up on the web
+    if options.segment:
+        segmentations = segment_word(user_word, lexicon, options.min_parts, options.max_parts, options.min_part_length)
+        print_segmentations(user_word, rank_segmentations(segmentations, frequencies, options.top), len(segmentations))
+        print('\n\n')
+        return
+
+    # so does a pattern, like 'c?t' or 'a*ion'
+    if is_pattern(user_word):
+        matches = find_pattern_matches(user_word, lexicon, open_pattern_index(lexicon))
+        counts = {word: frequencies.get(word) for word in matches}
+        ranked = rank_by_frequency(matches, frequencies, options.top)
+        if options.sort == 'alphabetical':
+            ranked = sorted(ranked)
+        print_matches(user_word, ranked, counts, options.sort, len(matches))
+        print('\n\n')
+        return
+
+    # as do the words containing the user's word
+    if options.contains:
+        containing = find_containing(user_word, lexicon, open_suffix_array(lexicon))
+        counts = {word: frequencies.get(word) for word in containing}
+        ranked = rank_by_frequency(containing, frequencies, options.top)
+        if options.sort == 'alphabetical':
+            ranked = sorted(ranked)
+        print_matches('*' + user_word + '*', ranked, counts, options.sort, len(containing))
+        print('\n\n')
+        return
+
+    # anagrams also only need the lexicon
+    if options.anagram:
+        anagrams, sub_anagrams = find_anagrams(user_word, lexicon, open_anagram_index(lexicon))
+        print_anagrams(user_word, rank_by_frequency(anagrams, frequencies, options.top),
+                       rank_by_frequency(sub_anagrams, frequencies, options.top), len(anagrams), len(sub_anagrams))
+        print('\n\n')
+        return
+
+
+    # look up the results; words that have been harvested come from the two-gram store (unless we asked for the
+    # web), and words we've searched for recently come from the suggestion cache instead of the web
+    # if the pages can't be downloaded, there's nothing to show (and nothing to save)
+    import requests
+    two_gram_store = None if options.live else open_two_gram_store()
+    suggestion_cache = SuggestionCache()
+    try:
+        results = search_word(user_word, lexicon, compound_index, new_one_grams, suggestion_cache,
+                              two_gram_store=two_gram_store)
+    except requests.RequestException as error:
+        print('\nCouldn\'t look up "%s" on the free dictionary: %s' % (user_word, error))
+        print('Check your internet connection and try again.')
+        print('\n\n')
+        return
+    finally:
+        suggestion_cache.close()
+        if two_gram_store is not None:
+            two_gram_store.close()
+
+
+    # if the word was determined to be invalid, stop here; if it's valid, print and save the results
+    if results is not None:
+        starting, ending = results
+
+        # one-grams with the user's word in the middle, with valid words on both sides of it
+        with span('middle_matching'):
+            middle = find_middle(user_word, lexicon, open_suffix_array(lexicon))
+
+        # keep just the results matching the pattern, if there is one
+        if options.pattern is not None:
+            starting = filter_by_pattern(starting, options.pattern.lower())
+            ending = filter_by_pattern(ending, options.pattern.lower())
+            middle = filter_by_pattern(middle, options.pattern.lower())
+        starting_count, ending_count, middle_count = len(starting), len(ending), len(middle)
+
+        # sort both lists alphabetically and by frequency (keeping just the most common ones, if asked to)
+        with span('ranking'):
+            starting, starting_by_frequency, starting_counts = sort_results(starting, frequencies, 1, options.top,
+                                                                            frequencies.with_prefix(user_word))
+            ending, ending_by_frequency, ending_counts = sort_results(ending, frequencies, 0, options.top,
+                                                                      frequencies.with_suffix(user_word))
+
+            middle = rank_by_frequency(middle, frequencies, options.top)
+
+        # print the finalized results to the console, in whichever order was asked for
+        if options.sort == 'frequency':
+            starting, ending = starting_by_frequency, ending_by_frequency
+        else:
+            middle = sorted(middle)
+        with span('printing'):
+            print_results(user_word, starting, ending, options.sort, starting_count, ending_count, middle, middle_count)
+
+        # at the end, save any changes that were made to the word list
+        with span('saving'):
+            save_lexicon(lexicon, compound_index, new_one_grams)
+
+    # only reach this point if the user's word was invalid; print message to the console, with the words it was
+    # most likely a typo of, if there are any
+    else:
+        corrections = did_you_mean(user_word, lexicon, frequencies, top=options.top or 5)
+        if len(corrections) > 0:
+            print_corrections(user_word, corrections)
+        else:
+            print('\nNo matches found! Double check that you\'ve entered a valid word and try again.')
+            print('Remember not to include any punctuation or spaces!')
 
-# to help keep the console clean and easy to read, print a few newlines at the end
-print('\n\n')
 
+    # to help keep the console clean and easy to read, print a few newlines at the end
+    print('\n\n')
 
 
 
+if __name__ == '__main__':
+    main()